@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import time
 import subprocess
@@ -67,6 +68,27 @@ def run_agent_task(name, agent, args):
     except Exception as e:
         logging.error(f"Critical failure running task {name}: {e}")
 
+def run_prompt_task(name, prompt, chat_id=None, lane="bulk"):
+    """Queues a prompt for the master on a user inbox lane (bulk by default)."""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.append(PROJECT_ROOT)
+    try:
+        import redis
+        from core.lanes import push_request
+
+        r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/1"), decode_responses=True)
+        push_request(r, {
+            "platform": "cron",
+            "task": name,
+            "chat_id": chat_id or os.getenv("TG_USER_ID"),
+            "username": f"cron:{name}",
+            "text": prompt,
+            "timestamp": time.time()
+        }, lane=lane)
+        logging.info(f"[+] Task {name} queued on the {lane} lane.")
+    except Exception as e:
+        logging.error(f"Critical failure queueing task {name}: {e}")
+
 class CronMaster:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
@@ -95,10 +117,16 @@ class CronMaster:
                     continue
                 
                 job_id = task["name"]
+                if "prompt" in task:
+                    func = run_prompt_task
+                    args = [task["name"], task["prompt"], task.get("chat_id"), task.get("lane", "bulk")]
+                else:
+                    func = run_agent_task
+                    args = [task["name"], task["agent"], task["args"]]
                 self.scheduler.add_job(
-                    run_agent_task,
+                    func,
                     CronTrigger.from_crontab(task["cron"]),
-                    args=[task["name"], task["agent"], task["args"]],
+                    args=args,
                     id=job_id
                 )
                 self.current_jobs[job_id] = task
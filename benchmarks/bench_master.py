@@ -0,0 +1,161 @@
+"""
+End-to-end master.py benchmark, fully offline.
+
+Starts master.py against a local Redis DB (flushed first), with the stub
+daemon in place of gateway/src/daemon.js and a scripted stub agent in a
+temporary agents dir. Then injects synthetic Telegram users into
+genie:user:inbox and measures time from push to the reply on
+genie:response:outbox.
+
+    python benchmarks/bench_master.py --users 8 --messages 3
+
+Requirements: a Redis server on --redis-url, and the all-MiniLM-L6-v2
+model in the local Hugging Face cache (HF_HUB_OFFLINE is forced on).
+The master's own settings (GENIE_MASTER_WORKERS, GENIE_WARM_AGENTS, ...)
+are passed through from the environment.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import tempfile
+import argparse
+import threading
+import subprocess
+import redis
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.tracing import percentile, summarize, load_spans
+
+USER_INBOX = "genie:user:inbox"
+RESPONSE_OUTBOX = "genie:response:outbox"
+
+def install_stub_agent(agents_dir):
+    target = os.path.join(agents_dir, "bench_agent", "src")
+    os.makedirs(target)
+    shutil.copy(os.path.join(ROOT, "benchmarks", "stub_agent.py"), os.path.join(target, "main.py"))
+
+def wait_for_lines(process, needles, timeout):
+    """Echoes process output until every needle showed up (in any order); keeps draining afterwards."""
+    missing = set(needles)
+    found = threading.Event()
+
+    def pump():
+        for line in process.stdout:
+            missing.difference_update([n for n in missing if n in line])
+            if not missing:
+                found.set()
+            if os.getenv("BENCH_VERBOSE"):
+                sys.stdout.write(f"[master] {line}")
+
+    threading.Thread(target=pump, daemon=True).start()
+    if not found.wait(timeout):
+        raise RuntimeError(f"master.py did not print {sorted(missing)} within {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline master.py throughput/latency benchmark")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15", help="Dedicated DB, it is flushed")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=3, help="Messages per user")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    args, daemon_args = parser.parse_known_args()
+
+    r = redis.from_url(args.redis_url, decode_responses=True)
+    r.ping()
+    r.flushdb()
+
+    workdir = tempfile.mkdtemp(prefix="genie_bench_")
+    agents_dir = os.path.join(workdir, "agents")
+    install_stub_agent(agents_dir)
+    trace_file = os.path.join(workdir, "spans.jsonl")
+
+    env = {
+        **os.environ,
+        "REDIS_URL": args.redis_url,
+        "GENIE_AGENTS_DIR": agents_dir,
+        "GENIE_TRACE": "file",
+        "GENIE_TRACE_FILE": trace_file,
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "PYTHONUNBUFFERED": "1",
+    }
+
+    daemon = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "stub_daemon.py"), "--redis-url", args.redis_url] + daemon_args,
+        cwd=ROOT, env=env,
+    )
+    master = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "master.py")],
+        cwd=ROOT, env=env, stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+
+    try:
+        t0 = time.time()
+        # "Active" comes before warm_up() is done; until "Models warm" requests skip RAG
+        wait_for_lines(master, ["Master Engine Active", "Models warm"], args.startup_timeout)
+        print(f"[*] master.py ready in {time.time() - t0:.1f}s")
+
+        sent = {}
+        total = args.users * args.messages
+        start = time.time()
+        for m in range(args.messages):
+            for u in range(args.users):
+                chat_id = 1000 + u
+                msg_id = f"{chat_id}:{m}"
+                sent.setdefault(chat_id, []).append((msg_id, time.time()))
+                r.rpush(USER_INBOX, json.dumps({
+                    "platform": "telegram",
+                    "chat_id": chat_id,
+                    "username": f"bench_user_{u}",
+                    "text": f"Benchmark question {m} from user {u}",
+                    "timestamp": time.time(),
+                }))
+
+        # Replies for a chat arrive in order, so match them FIFO per chat
+        latencies = []
+        deadline = start + args.timeout
+        while len(latencies) < total and time.time() < deadline:
+            result = r.blpop(RESPONSE_OUTBOX, timeout=1)
+            if not result:
+                continue
+            reply = json.loads(result[1])
+            queue = sent.get(reply.get("chat_id"))
+            if not queue or reply.get("text", "").startswith("⏳"):
+                continue
+            _, sent_at = queue.pop(0)
+            latencies.append(time.time() - sent_at)
+        elapsed = time.time() - start
+    finally:
+        master.send_signal(signal.SIGINT)
+        daemon.terminate()
+        for p in (master, daemon):
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    latencies.sort()
+    print(f"\n=== master.py benchmark ({args.users} users x {args.messages} messages) ===")
+    print(f"completed:   {len(latencies)}/{total}")
+    print(f"wall time:   {elapsed:.2f}s")
+    print(f"throughput:  {len(latencies) / elapsed:.2f} req/s")
+    for q in (50, 95, 99):
+        print(f"latency p{q}: {percentile(latencies, q):.2f}s")
+
+    if os.path.exists(trace_file):
+        print(f"\n{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}")
+        for name, row in sorted(summarize(load_spans("file", trace_file)).items(), key=lambda kv: -kv[1]["p50"]):
+            print(f"{name:<24}{row['count']:>8}{row['p50']:>12.1f}{row['p95']:>12.1f}{row['p99']:>12.1f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    if len(latencies) < total:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Scripted fake agent. bench_master.py installs it as
+<agents dir>/bench_agent/src/main.py.
+"""
+import sys
+import time
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.5, help="Total run time in seconds")
+    args, _ = parser.parse_known_args()
+
+    step = args.delay / max(1, args.lines)
+    for i in range(args.lines):
+        print(f"bench_agent: processed item {i}")
+        sys.stdout.flush()
+        time.sleep(step)
+    print("SUCCESS: bench task complete")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Offline stand-in for gateway/src/daemon.js.
+
+Pops jobs from genie:prompt:inbox and streams a scripted answer to
+genie:stream:<id> with a configurable first-token delay and token rate.
+A fresh question is answered with an EXECUTE_AGENT line for the stub agent
+(when --agent-ratio allows it); a prompt that already carries agent output
+gets a plain final summary, which ends the chain.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import redis
+
+PROMPT_QUEUE = "genie:prompt:inbox"
+
+def stream_answer(r, job, args, rng):
+    stream_key = f"genie:stream:{job['id']}"
+    r.set(f"genie:job:{job['id']}:picked", time.time(), ex=600)
+
+    if "[AGENT OUTPUT]" in job["prompt"] or rng.random() >= args.agent_ratio:
+        text = "Here is the summary of what you asked for. " * max(1, args.tokens // 8)
+    else:
+        text = (
+            "Let me run the agent for that.\n"
+            f"EXECUTE_AGENT: {args.agent} --lines {args.agent_lines} --delay {args.agent_delay}\n"
+            + "I will report back once it finishes. " * max(1, args.tokens // 8)
+        )
+
+    time.sleep(args.first_token_delay)
+    tokens = text.split(" ")
+    interval = 1.0 / args.token_rate if args.token_rate > 0 else 0
+    for i in range(0, len(tokens), args.chunk_tokens):
+        r.rpush(stream_key, " ".join(tokens[i:i + args.chunk_tokens]) + " ")
+        r.expire(stream_key, 3600)
+        time.sleep(interval * args.chunk_tokens)
+    r.rpush(stream_key, "END_OF_STREAM")
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini daemon for benchmarks")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="Seconds before the first chunk")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="Approximate tokens per answer")
+    parser.add_argument("--chunk-tokens", type=int, default=8, help="Tokens per pushed chunk")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs served at once (daemon.js serves 1)")
+    parser.add_argument("--agent", default="bench_agent")
+    parser.add_argument("--agent-ratio", type=float, default=0.5, help="Share of questions that call the agent")
+    parser.add_argument("--agent-lines", type=int, default=20)
+    parser.add_argument("--agent-delay", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    r = redis.from_url(args.redis_url, decode_responses=True)
+    rng = random.Random(args.seed)
+    slots = threading.BoundedSemaphore(args.concurrency)
+    print(f"[StubDaemon] Listening on {PROMPT_QUEUE} ({args.redis_url})", flush=True)
+
+    while True:
+        _, data = r.blpop(PROMPT_QUEUE, timeout=0)
+        job = json.loads(data)
+        slots.acquire()
+
+        def serve(job=job):
+            try:
+                stream_answer(r, job, args, rng)
+            finally:
+                slots.release()
+
+        threading.Thread(target=serve, daemon=True).start()
+
+if __name__ == "__main__":
+    main()
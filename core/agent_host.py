@@ -0,0 +1,118 @@
+"""
+Warm agent host.
+
+Started once per agent venv by core.agent_runner and kept alive between
+EXECUTE_AGENT calls. It pre-imports the heavy libraries agents share, then
+forks a fresh child for every invocation, so each run starts with an
+already-warm interpreter but still gets its own globals, argv and exit code.
+
+This file is executed by the agent's venv interpreter, so it must only use
+the standard library.
+"""
+import os
+import sys
+import json
+import runpy
+import socket
+import importlib
+import traceback
+
+MAX_MESSAGE = 1024 * 1024
+EVENT_FD_ENV = "GENIE_EVENT_FD"
+PARENT_CHECK_INTERVAL = 5
+
+def preload(modules):
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    return loaded
+
+def run_child(request, fds, sock):
+    """Runs inside the forked child. Never returns."""
+    code = 0
+    try:
+        os.setsid()
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        os.dup2(fds[2], 0)
+        for fd in fds[:3]:
+            os.close(fd)
+        sock.close()
+
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        if len(fds) > 3:
+            # Structured event channel, see core.protocol.AgentResponse.emit
+            os.environ[EVENT_FD_ENV] = str(fds[3])
+
+        script = request["script"]
+        sys.argv = [script] + request["args"]
+        sys.path[0] = os.path.dirname(os.path.abspath(script))
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+def serve(sock):
+    parent = os.getppid()
+    sock.settimeout(PARENT_CHECK_INTERVAL)
+    while True:
+        try:
+            msg, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE, 4)
+        except socket.timeout:
+            # Datagram sockets never report EOF: exit once the master is gone
+            if os.getppid() != parent:
+                return
+            continue
+        except OSError:
+            return
+        if not msg:
+            return
+
+        request = json.loads(msg)
+        if request.get("op") == "shutdown":
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_child(request, fds, sock)
+
+        for fd in fds:
+            os.close(fd)
+        sock.settimeout(None)
+        sock.send(json.dumps({"pid": pid}).encode())
+
+        _, status = os.waitpid(pid, 0)
+        sock.send(json.dumps({"pid": pid, "returncode": os.waitstatus_to_exitcode(status)}).encode())
+        sock.settimeout(PARENT_CHECK_INTERVAL)
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    modules = [m for m in sys.argv[2].split(",") if m] if len(sys.argv) > 2 else []
+    loaded = preload(modules)
+    sock.send(json.dumps({"ready": True, "preloaded": loaded}).encode())
+    serve(sock)
+
+if __name__ == "__main__":
+    main()
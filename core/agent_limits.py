@@ -0,0 +1,39 @@
+import os
+
+LIMITS_PATH = os.getenv("GENIE_AGENT_LIMITS", "config/agent_limits.yaml")
+DEFAULT_LIMITS = {"timeout": 900, "idle_timeout": 300}
+
+class AgentLimits:
+    """
+    Per-agent wall-clock and idle-output limits from config/agent_limits.yaml.
+    The file is re-read when it changes, so limits can be tuned live.
+    """
+
+    def __init__(self, path=LIMITS_PATH):
+        self.path = path
+        self._mtime = None
+        self._config = {}
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._config = {}
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            import yaml
+            with open(self.path, "r") as f:
+                self._config = yaml.safe_load(f) or {}
+            self._mtime = mtime
+        except Exception as e:
+            print(f"[LIMITS] Failed to load {self.path}: {e}")
+
+    def for_agent(self, name):
+        """Returns {"timeout": s, "idle_timeout": s}; 0 means unlimited."""
+        self._reload()
+        limits = dict(DEFAULT_LIMITS)
+        limits.update(self._config.get("default") or {})
+        limits.update((self._config.get("agents") or {}).get(name) or {})
+        return {k: float(limits.get(k) or 0) for k in DEFAULT_LIMITS}
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import codecs
+import selectors
+from collections import deque
+
+# Legacy stdout markers, matched with a single pass per line
+LEGACY_MARKER_RE = re.compile(
+    r"TELEGRAM_SUMMARY:(?P<summary>.*)"
+    r"|IMAGE_GENERATED:(?P<image>.*)"
+    r"|(?P<published>SUCCESS: Post published to.*)"
+    r"|(?P<failed>ERROR: Publication failed.*)"
+)
+
+def parse_legacy_marker(line):
+    """Maps a legacy marker line to the equivalent structured event, or None."""
+    match = LEGACY_MARKER_RE.search(line)
+    if not match:
+        return None
+    if match.group("summary") is not None:
+        return {"event": "telegram_summary", "text": match.group("summary").strip()}
+    if match.group("image") is not None:
+        return {"event": "image_generated", "path": match.group("image").strip()}
+    if match.group("published") is not None:
+        return {"event": "publish_succeeded", "message": line.strip()}
+    return {"event": "publish_failed", "message": line.strip()}
+
+def parse_event_line(line):
+    """Parses one JSON line from the event channel, or None if malformed."""
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(event, dict) and isinstance(event.get("event"), str):
+        return event
+    return None
+
+def event_key(event):
+    """Identity used to avoid forwarding the same event from both channels."""
+    return json.dumps(event, sort_keys=True)
+
+class AgentOutput:
+    """
+    Bounded, append-only buffer for agent stdout.
+
+    Keeps the first and last max_chars/2 characters and counts what was
+    dropped in between, so memory stays flat when an agent dumps megabytes.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars or int(os.getenv("GENIE_AGENT_OUTPUT_MAX", "262144"))
+        self._half = max(1, self.max_chars // 2)
+        self._head = []
+        self._head_size = 0
+        self._tail = deque()
+        self._tail_size = 0
+        self.dropped_lines = 0
+        self.dropped_chars = 0
+
+    def append(self, line):
+        if not self._tail and self._head_size + len(line) <= self._half:
+            self._head.append(line)
+            self._head_size += len(line)
+            return
+
+        if len(line) > self._half:
+            self.dropped_chars += len(line) - self._half
+            line = line[-self._half:]
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size > self._half:
+            dropped = self._tail.popleft()
+            self._tail_size -= len(dropped)
+            self.dropped_lines += 1
+            self.dropped_chars += len(dropped)
+
+    def __bool__(self):
+        return bool(self._head or self._tail)
+
+    def text(self):
+        if not self.dropped_chars:
+            return "".join(self._head) + "".join(self._tail)
+        marker = f"\n... ({self.dropped_lines} lines / {self.dropped_chars} chars omitted) ...\n"
+        return "".join(self._head) + marker + "".join(self._tail)
+
+class LineSplitter:
+    """
+    Decodes one agent stream and cuts it into lines. Only newly read data
+    is scanned for newlines, and a partial line that grows past max_chars
+    is passed on as it is instead of being held until its newline.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars or int(os.getenv("GENIE_AGENT_OUTPUT_MAX", "262144"))
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = []
+        self._pending_size = 0
+
+    def _take(self):
+        line = "".join(self._pending)
+        self._pending, self._pending_size = [], 0
+        return line
+
+    def feed(self, data):
+        """The lines completed by data, each ending in "\n" (flushed partials don't)."""
+        text = self._decoder.decode(data)
+        lines = []
+        start = 0
+        end = text.find("\n")
+        while end != -1:
+            self._pending.append(text[start:end])
+            line = self._take()
+            lines.append((line[:-1] if line.endswith("\r") else line) + "\n")
+            start = end + 1
+            end = text.find("\n", start)
+        if start < len(text):
+            self._pending.append(text[start:])
+            self._pending_size += len(text) - start
+            if self._pending_size > self.max_chars:
+                lines.append(self._take())
+        return lines
+
+    def close(self):
+        """Whatever followed the last newline."""
+        self._pending.append(self._decoder.decode(b"", final=True))
+        return self._take()
+
+def open_event_channel():
+    """
+    Creates the dedicated event pipe. Returns (read_fd, write_fd); the write
+    end is handed to the agent, which finds it through GENIE_EVENT_FD (core.protocol.EVENT_FD_ENV).
+    """
+    return os.pipe()
+
+def iter_agent_streams(process, event_fd=None, tick=1.0, max_line=None):
+    """
+    Multiplexes an agent's stdout, stderr and event channel.
+
+    Yields (kind, line) where kind is "stdout", "stderr" or "event", and
+    ("tick", None) whenever nothing arrived for `tick` seconds. Stops once
+    every stream is closed, or once the agent has exited and its streams
+    went quiet (e.g. a detached grandchild still holds stdout open).
+    Lines longer than max_line are yielded in pieces (see LineSplitter).
+    """
+    selector = selectors.DefaultSelector()
+    streams = {process.stdout.fileno(): "stdout", process.stderr.fileno(): "stderr"}
+    if event_fd is not None:
+        streams[event_fd] = "event"
+
+    splitters = {}
+    for fd, kind in streams.items():
+        selector.register(fd, selectors.EVENT_READ, kind)
+        splitters[fd] = LineSplitter(max_line)
+
+    try:
+        while selector.get_map():
+            ready = selector.select(tick)
+            if not ready:
+                if process.poll() is not None:
+                    break
+                yield "tick", None
+                continue
+
+            for key, _ in ready:
+                splitter = splitters[key.fd]
+                data = os.read(key.fd, 65536)
+                if not data:
+                    selector.unregister(key.fd)
+                    rest = splitter.close()
+                    if rest:
+                        yield key.data, rest
+                    continue
+
+                for line in splitter.feed(data):
+                    yield key.data, line
+    finally:
+        selector.close()
+
+    process.wait()
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import signal
+import socket
+import weakref
+import threading
+import subprocess
+
+from core.protocol import EVENT_FD_ENV
+
+HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_host.py")
+DEFAULT_PRELOAD = "requests,PIL.Image,redis,dotenv,psutil,yaml"
+MAX_MESSAGE = 1024 * 1024
+
+class WarmInvocation:
+    """
+    A single agent run on a warm host. Exposes the subset of the Popen
+    interface execute_agent relies on: stdout, stderr, pid, poll(), wait().
+    """
+
+    def __init__(self, host, pid, stdout, stderr):
+        self.host = host
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            self.host.collect(self, block=False)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            self.host.collect(self, block=True, timeout=timeout)
+        return self.returncode
+
+class WarmHost:
+    """One persistent agent_host.py process bound to a venv interpreter."""
+
+    def __init__(self, python_exe, preload):
+        self.python_exe = python_exe
+        self.calls = 0
+        self.busy = False
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.proc = subprocess.Popen(
+                [python_exe, HOST_SCRIPT, str(child_sock.fileno()), preload],
+                pass_fds=[child_sock.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+            )
+        finally:
+            child_sock.close()
+
+        # Wait for the host to finish its imports
+        self.sock.settimeout(120)
+        ready = json.loads(self.sock.recv(MAX_MESSAGE))
+        if not ready.get("ready"):
+            raise RuntimeError(f"Agent host for {python_exe} failed to start")
+        self.preloaded = ready.get("preloaded", [])
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def start(self, script, args, event_fd=None, stdin=None):
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        stdin_fd = os.dup(stdin) if stdin is not None else os.open(os.devnull, os.O_RDONLY)
+        fds = [stdout_w, stderr_w, stdin_fd] + ([event_fd] if event_fd is not None else [])
+        try:
+            request = {
+                "script": os.path.abspath(script),
+                "args": args,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            }
+            self.sock.settimeout(10)
+            socket.send_fds(self.sock, [json.dumps(request).encode()], fds)
+            started = json.loads(self.sock.recv(MAX_MESSAGE))
+        except Exception:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+            os.close(stdin_fd)
+
+        self.calls += 1
+        self.busy = True
+        return WarmInvocation(
+            self,
+            started["pid"],
+            os.fdopen(stdout_r, "r", buffering=1),
+            os.fdopen(stderr_r, "r"),
+        )
+
+    def collect(self, invocation, block, timeout=None):
+        """Reads the exit status of the current invocation, if available."""
+        try:
+            self.sock.settimeout(timeout if block else 0)
+            msg = self.sock.recv(MAX_MESSAGE)
+        except (BlockingIOError, socket.timeout):
+            if self.alive():
+                return
+            msg = b""
+        except OSError:
+            msg = b""
+
+        if msg:
+            invocation.returncode = json.loads(msg)["returncode"]
+        else:
+            # Host died mid-call
+            invocation.returncode = -1
+            self.close()
+        self.busy = False
+
+    def close(self):
+        try:
+            self.sock.send(json.dumps({"op": "shutdown"}).encode())
+        except OSError:
+            pass
+        self.sock.close()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+class AgentRunner:
+    """
+    Launches agent scripts. By default each venv interpreter gets a warm
+    host that forks a pre-imported child per call; hosts are recycled after
+    GENIE_WARM_AGENT_MAX_CALLS calls or when they crash. Falls back to a
+    plain subprocess when the host is busy or unavailable.
+    """
+
+    def __init__(self, enabled=None, max_calls=None, preload=None):
+        if enabled is None:
+            enabled = os.getenv("GENIE_WARM_AGENTS", "1") != "0"
+        self.enabled = enabled and hasattr(os, "fork") and hasattr(socket, "send_fds")
+        self.max_calls = max_calls or int(os.getenv("GENIE_WARM_AGENT_MAX_CALLS", "50"))
+        self.preload = preload if preload is not None else os.getenv("GENIE_WARM_AGENT_PRELOAD", DEFAULT_PRELOAD)
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._live = weakref.WeakSet()
+
+    def spawn(self, cmd, event_fd=None, stdin=None):
+        """
+        Starts cmd ([python_exe, script, *args]) and returns a Popen-like
+        handle. event_fd, if given, is inherited by the agent and announced
+        to it through GENIE_EVENT_FD. The agent reads the stdin fd, or
+        /dev/null without one. Every agent leads its own process group, so
+        kill_agent() also reaches whatever it launched.
+        """
+        process = None
+        if self.enabled:
+            try:
+                process = self._spawn_warm(cmd[0], cmd[1], cmd[2:], event_fd, stdin)
+            except Exception as e:
+                print(f"[RUNNER] Warm start failed for {cmd[1]}, using cold start: {e}")
+
+        if process is None:
+            env = None
+            pass_fds = ()
+            if event_fd is not None:
+                env = {**os.environ, EVENT_FD_ENV: str(event_fd)}
+                pass_fds = (event_fd,)
+            process = subprocess.Popen(
+                cmd, stdin=subprocess.DEVNULL if stdin is None else stdin,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, universal_newlines=True,
+                env=env, pass_fds=pass_fds, start_new_session=True,
+            )
+        self._live.add(process)
+        return process
+
+    def _spawn_warm(self, python_exe, script, args, event_fd=None, stdin=None):
+        with self._lock:
+            host = self._hosts.get(python_exe)
+            if host and host.busy:
+                return None
+            if host and (not host.alive() or host.calls >= self.max_calls):
+                host.close()
+                host = None
+            if host is None:
+                try:
+                    host = WarmHost(python_exe, self.preload)
+                except Exception:
+                    self._hosts.pop(python_exe, None)
+                    raise
+                self._hosts[python_exe] = host
+            # Hold the slot while the request is handed over
+            host.busy = True
+
+        try:
+            return host.start(script, args, event_fd, stdin)
+        except Exception:
+            with self._lock:
+                host.close()
+                self._hosts.pop(python_exe, None)
+            raise
+
+    def shutdown(self):
+        # Agents run in their own sessions, so Ctrl+C does not reach them
+        for process in list(self._live):
+            if process.returncode is None:
+                kill_agent(process, grace=1)
+        with self._lock:
+            for host in self._hosts.values():
+                host.close()
+            self._hosts.clear()
+
+def kill_agent(process, grace=3):
+    """
+    Terminates an agent's whole process group: SIGTERM, then SIGKILL for
+    anything still around after `grace` seconds (e.g. a browser it started).
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+    deadline = time.time() + grace
+    while time.time() < deadline and process.poll() is None:
+        time.sleep(0.1)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        pass
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_agent_runner():
+    """Process-wide AgentRunner."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AgentRunner()
+        return _runner
@@ -3,6 +3,7 @@ import json
 import uuid
 import os
 import time
+from core.tracing import get_tracer, record_span
 
 # Configuration
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
@@ -23,10 +24,12 @@ def call_gemini(prompt, timeout=300):
         }
         
         # 1. Push Request
+        pushed_at = time.time()
         r.rpush(PROMPT_QUEUE, json.dumps(payload))
         
         # 2. Poll for Response Stream
         start_time = time.time()
+        first_chunk = True
         
         while True:
             # Check timeout
@@ -39,6 +42,9 @@ def call_gemini(prompt, timeout=300):
             
             if result:
                 _, chunk = result
+                if first_chunk:
+                    first_chunk = False
+                    trace_first_chunk(r, job_id, pushed_at)
                 if chunk == "END_OF_STREAM":
                     break
                 yield chunk
@@ -49,10 +55,24 @@ def call_gemini(prompt, timeout=300):
 
         # Cleanup (Optional, daemon sets expiry but good practice)
         r.delete(stream_key)
+        record_span("gemini.stream", time.time() - pushed_at, start=pushed_at)
 
     except Exception as e:
         yield f"\n[System Error]: Failed to communicate with AI Bridge: {str(e)}"
 
+def trace_first_chunk(r, job_id, pushed_at):
+    """
+    Records daemon queue wait (push -> daemon pickup, stamped by daemon.js)
+    and time to first chunk for the current request.
+    """
+    if not get_tracer().enabled:
+        return
+    now = time.time()
+    record_span("gemini.first_chunk", now - pushed_at, start=pushed_at)
+    picked = r.get(f"genie:job:{job_id}:picked")
+    if picked:
+        record_span("gemini.queue_wait", max(0.0, float(picked) - pushed_at), start=pushed_at)
+
 def call_gemini_complete(prompt, timeout=300):
     """
     Helper to get the full response at once.
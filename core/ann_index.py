@@ -0,0 +1,170 @@
+"""
+IVF-flat approximate nearest-neighbour search for the brute-force memory
+indexes (MemoryIndex, SegmentStore).
+
+Vectors are grouped into nlist clusters (spherical k-means); a query only
+scores the rows of its nprobe closest clusters. Centroids are persisted,
+new rows are assigned to the nearest centroid as they arrive, and the
+centroids are retrained once the corpus outgrows them. Below
+GENIE_ANN_MIN_ROWS everything stays exact.
+
+Knobs: GENIE_ANN_NPROBE (recall vs latency), GENIE_ANN_NLIST (0 = sqrt(rows)).
+
+    python -m core.ann_index [--rows N] [--dim D]   # recall/latency per nprobe vs brute force
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+ANN_DIR = os.getenv("GENIE_ANN_DIR", "cache/ann")
+ANN_NLIST = int(os.getenv("GENIE_ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("GENIE_ANN_NPROBE", "8"))
+ANN_MIN_ROWS = int(os.getenv("GENIE_ANN_MIN_ROWS", "2048"))
+# Retrain once the corpus is this many times the size the centroids saw
+RETRAIN_GROWTH = 4
+TRAIN_SAMPLE = 50000
+
+def default_nlist(rows):
+    return ANN_NLIST or max(1, int(np.sqrt(rows)))
+
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means on (a sample of) L2-normalized vectors."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > TRAIN_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), TRAIN_SAMPLE, replace=False)]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        # Re-seed empty clusters with random rows
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-8)
+    return centroids.astype(np.float32)
+
+def top_k_rows(sims, k):
+    """Indices of the k largest sims, best first."""
+    k = min(k, len(sims))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+    return top[np.argsort(-sims[top])]
+
+class IVFIndex:
+    """Centroids plus the probe logic; callers keep one list id per row."""
+
+    def __init__(self, centroids, trained_rows, nprobe=None, model=None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.trained_rows = trained_rows
+        self.nprobe = nprobe or ANN_NPROBE
+        self.model = model
+
+    @classmethod
+    def train(cls, vectors, nlist=None, rows=None, model=None):
+        """rows: corpus size when vectors is a sample of it."""
+        rows = rows or len(vectors)
+        return cls(train_centroids(vectors, nlist or default_nlist(rows)), rows, model=model)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def dim(self):
+        return self.centroids.shape[1]
+
+    def stale(self, rows):
+        return rows > self.trained_rows * RETRAIN_GROWTH
+
+    def assign(self, vectors, chunk=8192):
+        """Nearest list of each (normalized) row."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            lists[start:start + chunk] = (vectors[start:start + chunk] @ self.centroids.T).argmax(axis=1)
+        return lists
+
+    def probe(self, query, nprobe=None):
+        """Boolean mask over lists: the nprobe closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        mask = np.zeros(self.nlist, dtype=bool)
+        mask[top_k_rows(self.centroids @ query, nprobe)] = True
+        return mask
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, self.centroids)
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"model": self.model, "trained_rows": self.trained_rows}, f)
+        os.replace(path + ".tmp", path)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path, dim, model=None):
+        """The saved index, or None when missing or trained for another model/dimension."""
+        try:
+            with open(path + ".json", "r") as f:
+                meta = json.load(f)
+            centroids = np.load(path)
+        except (OSError, ValueError):
+            return None
+        if meta.get("model") != model or centroids.ndim != 2 or centroids.shape[1] != dim:
+            return None
+        return cls(centroids, meta["trained_rows"], model=model)
+
+def recall_at_k(index, queries, top_k=10, nprobe=None):
+    """
+    Mean overlap between index.search (ANN) and index.search(exact=True)
+    (brute force, the ground truth) over the queries.
+    """
+    hits = 0
+    for query in queries:
+        exact = {text for text, _ in index.search(query, top_k, exact=True)}
+        approx = {text for text, _ in index.search(query, top_k, nprobe=nprobe)}
+        hits += len(exact & approx) / max(len(exact), 1)
+    return hits / max(len(queries), 1)
+
+def main():
+    from core.segment_store import SegmentStore
+
+    parser = argparse.ArgumentParser(description="IVF recall/latency vs brute force on synthetic clustered vectors")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, args.rows // 100), args.dim))
+    vectors = centers[rng.integers(len(centers), size=args.rows)] + 0.5 * rng.normal(size=(args.rows, args.dim))
+    queries = (centers[rng.integers(len(centers), size=args.queries)] + 0.5 * rng.normal(size=(args.queries, args.dim))).astype(np.float32)
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        store = SegmentStore(directory, segment_rows=args.rows, ann_min_rows=args.rows + 1)
+        store.put_many([(str(i), str(i), v) for i, v in enumerate(vectors)])
+        store.build_ann()
+
+        def latency(**kwargs):
+            start = time.perf_counter()
+            for query in queries:
+                store.search(query, args.top_k, **kwargs)
+            return (time.perf_counter() - start) / len(queries) * 1000
+
+        print(f"rows {args.rows}, dim {args.dim}, nlist {store.ann.nlist}, top {args.top_k}")
+        print(f"{'nprobe':<10}{'recall':>10}{'ms/query':>12}")
+        print(f"{'exact':<10}{1.0:>10.3f}{latency(exact=True):>12.2f}")
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > store.ann.nlist:
+                break
+            recall = recall_at_k(store, queries, args.top_k, nprobe)
+            print(f"{nprobe:<10}{recall:>10.3f}{latency(nprobe=nprobe):>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,31 @@
 import os
-from core.vector_engine import GenieVectorEngine
+import threading
+from core.tracing import span
 
 class ContextBuilder:
     _vector_engine = None # Class-level singleton
+    _engine_lock = threading.Lock()
 
-    def __init__(self, root_dir=None):
+    def __init__(self, root_dir=None, lazy=False):
+        """lazy=True defers the vector engine to warm(); RAG is skipped until then."""
         self.root_dir = root_dir or os.getcwd()
+        self.lazy = lazy
+        if not lazy:
+            self.warm()
+
+    def warm(self):
         # Ensure VectorEngine is only initialized ONCE
-        if ContextBuilder._vector_engine is None:
-            print("[*] Waking up Optimized Memory Engine (RedisVL)...")
-            ContextBuilder._vector_engine = GenieVectorEngine()
-            print("[✓] Memory Engine Ready.")
-        self.vector_engine = ContextBuilder._vector_engine
+        with ContextBuilder._engine_lock:
+            if ContextBuilder._vector_engine is None:
+                from core.vector_engine import GenieVectorEngine
+                print("[*] Waking up Optimized Memory Engine (RedisVL)...")
+                ContextBuilder._vector_engine = GenieVectorEngine()
+                print("[✓] Memory Engine Ready.")
+        return ContextBuilder._vector_engine
+
+    @property
+    def vector_engine(self):
+        return self.warm()
 
     def build_context(self, user_input, intent="YOLO"):
         soul_path = os.path.join(self.root_dir, "SOUL.md")
@@ -22,11 +36,15 @@ class ContextBuilder:
 
         # RAG Search via RedisVL
         rag_content = ""
-        try:
-            relevant_chunks = self.vector_engine.search(user_input, top_k=3)
-            rag_content = "\n".join(relevant_chunks)
-        except Exception as e:
-            print(f"[!] RAG Search failed (Likely missing RediSearch module): {e}")
+        if self.lazy and ContextBuilder._vector_engine is None:
+            print("[*] Memory engine still warming up, answering without RAG")
+        else:
+            try:
+                with span("rag.search"):
+                    relevant_chunks = self.vector_engine.search(user_input, top_k=3)
+                rag_content = "\n".join(relevant_chunks)
+            except Exception as e:
+                print(f"[!] RAG Search failed (Likely missing RediSearch module): {e}")
 
         cwd = os.getcwd()
         context = f"{soul_content}\n\n"
@@ -39,6 +57,7 @@ class ContextBuilder:
             
         context += "\n\n--- PROTOCOL ---\n"
         context += "To take action, use: EXECUTE_AGENT: <agent_name> --args\n"
+        context += "Independent actions can be issued together, one EXECUTE_AGENT line each; they run in parallel.\n"
         context += "----------------\n"
             
         return context.strip()
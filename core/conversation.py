@@ -0,0 +1,114 @@
+import os
+import re
+import hashlib
+from collections import namedtuple
+
+# CJK ideographs/kana/hangul are roughly one token each; other text is split
+# into words and punctuation, with long words costing ~1 token per 6 chars.
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+|[^\s\w]")
+
+Turn = namedtuple("Turn", ["response", "agent_output"])
+
+CONTINUE_INSTRUCTION = "[INSTRUCTION]: Process the agent output and continue if needed. If task complete, provide final summary."
+
+def count_tokens(text):
+    """Estimates the model token count of text (SentencePiece-style vocab)."""
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        if piece[0].isascii():
+            total += 1 + (len(piece) - 1) // 6
+        else:
+            total += 1
+    return total
+
+def _first_line(text, limit=160):
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            return line if len(line) <= limit else line[:limit] + "..."
+    return ""
+
+def _trim_middle(text, max_tokens, counter):
+    """Shrinks text to about max_tokens, keeping its head and tail."""
+    if counter(text) <= max_tokens:
+        return text
+    half = int(len(text) * max_tokens / counter(text)) // 2
+    while True:
+        tail = text[len(text) - half:] if half else ""
+        trimmed = f"{text[:half]}\n... (trimmed to fit the prompt budget) ...\n{tail}"
+        if half == 0 or counter(trimmed) <= max_tokens:
+            return trimmed
+        half = int(half * 0.9)
+
+class ConversationState:
+    """
+    Prompt state for one request's agent-chaining loop.
+
+    The base prompt (SOUL, RAG, hints and the user input) is always kept.
+    The most recent turns are kept verbatim; older turns are compacted into
+    a rolling one-line-per-step summary, and an agent output identical to an
+    earlier one is replaced by a back-reference. render() stays within the
+    token budget (GENIE_PROMPT_TOKEN_BUDGET) whenever the base prompt does.
+    """
+
+    def __init__(self, base_prompt, budget=None, keep_recent=1, counter=count_tokens):
+        self.base_prompt = base_prompt
+        self.budget = budget or int(os.getenv("GENIE_PROMPT_TOKEN_BUDGET", "8000"))
+        self.keep_recent = max(1, keep_recent)
+        self.counter = counter
+        self.turns = []          # verbatim turns, oldest first
+        self.summary = []        # one line per compacted step
+        self._step = 0
+        self._seen_outputs = {}  # output digest -> step number
+
+    def add_turn(self, response, agent_output):
+        self._step += 1
+        digest = hashlib.sha1(agent_output.encode("utf-8")).hexdigest()
+        if digest in self._seen_outputs:
+            agent_output = f"(identical to the agent output of step {self._seen_outputs[digest]})"
+        else:
+            self._seen_outputs[digest] = self._step
+        self.turns.append((self._step, Turn(response, agent_output)))
+
+    def _compact_oldest(self):
+        step, turn = self.turns.pop(0)
+        directives = [l.strip() for l in turn.response.splitlines() if "EXECUTE_AGENT:" in l]
+        action = "; ".join(directives) or _first_line(turn.response)
+        self.summary.append(f"- Step {step}: {action} -> {_first_line(turn.agent_output)}")
+
+    def _render(self):
+        parts = [self.base_prompt]
+        if self.summary:
+            parts.append("[EARLIER STEPS (summarized)]:\n" + "\n".join(self.summary))
+        for _, turn in self.turns:
+            parts.append(f"[AI PREVIOUS RESPONSE]: {turn.response}")
+            parts.append(f"[AGENT OUTPUT]: {turn.agent_output}")
+        if self.turns:
+            parts.append(CONTINUE_INSTRUCTION)
+        return "\n\n".join(parts)
+
+    def render(self):
+        """Returns the next prompt, compacting history to fit the budget."""
+        prompt = self._render()
+        while self.counter(prompt) > self.budget and len(self.turns) > self.keep_recent:
+            self._compact_oldest()
+            prompt = self._render()
+
+        # Still too large: shrink the latest turn, then drop old summary lines
+        for field in ("agent_output", "response"):
+            overflow = self.counter(prompt) - self.budget
+            if overflow <= 0 or not self.turns:
+                break
+            step, turn = self.turns[-1]
+            text = getattr(turn, field)
+            allowed = max(50, self.counter(text) - overflow)
+            self.turns[-1] = (step, turn._replace(**{field: _trim_middle(text, allowed, self.counter)}))
+            prompt = self._render()
+        while self.counter(prompt) > self.budget and self.summary:
+            self.summary.pop(0)
+            prompt = self._render()
+        return prompt
+
+    def token_count(self):
+        return self.counter(self._render())
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import deque
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when a key already has its maximum of requests."""
+
+
+class RequestDispatcher:
+    """
+    Runs requests on a fixed pool of worker threads.
+
+    Requests sharing a key (the Telegram chat_id, or "cli") are executed
+    strictly in arrival order and never overlap; requests with different
+    keys run in parallel up to the pool size. Keys are served round robin,
+    so one chat with a long backlog cannot starve the others, and each key
+    may hold at most `max_per_key` requests (running + queued).
+    """
+
+    def __init__(self, handler, workers=None, max_per_key=None):
+        self.handler = handler
+        self.workers = max(1, workers or int(os.getenv("GENIE_MASTER_WORKERS", "4")))
+        self.max_per_key = max(1, max_per_key or int(os.getenv("GENIE_CHAT_MAX_PENDING", "4")))
+
+        self._queues = {}        # key -> deque of args, in arrival order
+        self._ring = deque()     # keys with queued requests, in round-robin order
+        self._busy = set()       # keys with a request currently executing
+        self._cond = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self._listeners = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"genie-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, key, *args, capped=True):
+        """
+        Queues a request. Returns immediately with the number of requests of
+        the same key ahead of it (running or queued); 0 means it is next.
+        Raises QueueFull when the key is already at max_per_key, unless
+        capped=False (scheduled jobs).
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Dispatcher is shut down")
+            queue = self._queues.get(key)
+            ahead = (len(queue) if queue else 0) + (1 if key in self._busy else 0)
+            if capped and ahead >= self.max_per_key:
+                raise QueueFull(f"{key} already has {ahead} requests pending")
+            if queue is None:
+                queue = self._queues[key] = deque()
+                self._ring.append(key)
+            queue.append(args)
+            self._cond.notify()
+            return ahead
+
+    def pending_count(self, key=None):
+        with self._cond:
+            if key is None:
+                return sum(len(q) for q in self._queues.values())
+            return len(self._queues.get(key, ()))
+
+    def drop_pending(self, key):
+        """Discards the queued (not yet running) requests of a key; returns how many."""
+        with self._cond:
+            queue = self._queues.pop(key, None)
+            if not queue:
+                return 0
+            self._ring.remove(key)
+            self._cond.notify_all()
+            return len(queue)
+
+    def has_capacity(self):
+        """True when an idle worker would not find a runnable request waiting."""
+        with self._cond:
+            runnable = sum(1 for key in self._ring if key not in self._busy)
+            return len(self._busy) + runnable < self.workers
+
+    def add_listener(self, callback):
+        """Registers callback() to be called (on a worker thread) after each request."""
+        self._listeners.append(callback)
+
+    def _take_next(self):
+        """Pops the next request of the first key in the ring that is not executing."""
+        for i, key in enumerate(self._ring):
+            if key in self._busy:
+                continue
+            del self._ring[i]
+            queue = self._queues[key]
+            args = queue.popleft()
+            if queue:
+                self._ring.append(key)  # back of the line for its next request
+            else:
+                del self._queues[key]
+            self._busy.add(key)
+            return key, args
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._take_next()
+                while job is None:
+                    if self._closed and not self._ring:
+                        return
+                    self._cond.wait()
+                    job = self._take_next()
+
+            key, args = job
+            try:
+                self.handler(*args)
+            except Exception as e:
+                print(f"[DISPATCHER] Request for {key} failed: {e}")
+            finally:
+                with self._cond:
+                    self._busy.discard(key)
+                    # A queued request for this key may now be runnable
+                    self._cond.notify_all()
+                for callback in self._listeners:
+                    callback()
+
+    def shutdown(self, wait=True):
+        """Stops accepting requests; optionally drains the queue first."""
+        with self._cond:
+            self._closed = True
+            if not wait:
+                self._queues.clear()
+                self._ring.clear()
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
@@ -0,0 +1,71 @@
+"""
+Embedding server: one copy of the model for master.py, the agents and
+ingest_memory.
+
+Clients (core.embeddings.RemoteEmbedder, used by get_embedder()) connect to
+a Unix socket and send length-prefixed JSON {"texts": [...]}; the reply is a
+JSON header {"shape": [n, dim], "model": model_key} followed by the raw
+float32 matrix.
+Requests from concurrent connections are merged into shared forward passes
+by EmbeddingProvider's micro-batching.
+
+    python -m core.embed_server [--socket /tmp/genie_embed.sock]
+"""
+import os
+import json
+import argparse
+import socketserver
+
+from core.embeddings import EMBED_SOCKET, EmbeddingProvider, send_frame, recv_frame
+
+class EmbedRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        provider = self.server.provider
+        while True:
+            try:
+                frame = recv_frame(self.request)
+            except OSError:
+                return
+            if frame is None:
+                return
+            try:
+                texts = json.loads(frame)["texts"]
+                vectors = provider.encode([str(t) for t in texts])
+                header = {"shape": list(vectors.shape), "model": provider.model_key()}
+            except Exception as e:
+                send_frame(self.request, json.dumps({"error": str(e)}).encode("utf-8"))
+                continue
+            send_frame(self.request, json.dumps(header).encode("utf-8"))
+            send_frame(self.request, vectors.tobytes())
+
+class EmbedServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, provider):
+        self.provider = provider
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket of a previous run
+        super().__init__(path, EmbedRequestHandler)
+        os.chmod(path, 0o600)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding server")
+    parser.add_argument("--socket", default=EMBED_SOCKET or "/tmp/genie_embed.sock")
+    args = parser.parse_args()
+
+    provider = EmbeddingProvider()
+    provider.encode(["warm up"])
+    server = EmbedServer(args.socket, provider)
+    print(f"[*] Embedding server ready on {args.socket} (dim {provider.dimension()})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print(f"[*] Embedding server stopped after {provider.batches} batches")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+from core.embeddings import MODEL_NAME, EMBED_BACKEND, get_embedder
+
+def model_key(encoder=None):
+    """
+    Identifies the vector space of encoder (default: the process-wide
+    embedder): model name plus the backend that actually loaded, so an
+    onnx -> torch fallback never reads or writes onnx vectors.
+    """
+    key = getattr(encoder or get_embedder(), "model_key", None)
+    return key() if key else f"{MODEL_NAME}@{EMBED_BACKEND}"
+
+class EmbeddingCache:
+    """
+    On-disk embeddings of a static corpus (route phrases, docs), so restarts
+    skip the model entirely unless the texts changed.
+
+    Each cache is a pair of files in GENIE_EMBED_CACHE_DIR:
+        <name>.npy   float32 matrix, memory-mapped on load
+        <name>.json  {"model": ..., "keys": [sha1(model + text), ...]} row index
+    """
+
+    def __init__(self, name, directory=None, model=None, encoder=None):
+        directory = directory or os.getenv("GENIE_EMBED_CACHE_DIR", "cache/embeddings")
+        self.matrix_path = os.path.join(directory, f"{name}.npy")
+        self.index_path = os.path.join(directory, f"{name}.json")
+        self.model = model  # model_key(encoder), resolved on first use
+        self.encoder = encoder
+        self._vectors = None  # key -> vector
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, encode):
+        """
+        Vectors for texts as an (n, dim) matrix in the same order. Only texts
+        not cached yet are passed to encode(); the files are rewritten with
+        exactly `texts` whenever something new was encoded.
+        """
+        with self._lock:
+            if self.model is None:
+                self.model = model_key(self.encoder)
+            if self._vectors is None:
+                self._vectors = self._load()
+            keys = [self.key(t) for t in texts]
+            missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in self._vectors))
+            if missing:
+                for text, vector in zip(missing, np.asarray(encode(missing), dtype=np.float32)):
+                    self._vectors[self.key(text)] = vector
+                self._save(keys)
+            if not keys:
+                return np.zeros((0, 0), dtype=np.float32)
+            return np.vstack([self._vectors[k] for k in keys])
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return {}
+        if index.get("model") != self.model or len(index.get("keys", [])) != len(matrix):
+            return {}
+        return dict(zip(index["keys"], matrix))
+
+    def _save(self, keys):
+        keys = list(dict.fromkeys(keys))
+        try:
+            os.makedirs(os.path.dirname(self.matrix_path) or ".", exist_ok=True)
+            matrix = np.vstack([self._vectors[k] for k in keys]).astype(np.float32)
+            # Write-then-rename so readers never see a half-written pair
+            with open(self.matrix_path + ".tmp", "wb") as f:
+                np.save(f, matrix)
+            with open(self.index_path + ".tmp", "w") as f:
+                json.dump({"model": self.model, "keys": keys}, f)
+            os.replace(self.matrix_path + ".tmp", self.matrix_path)
+            os.replace(self.index_path + ".tmp", self.index_path)
+        except (OSError, ValueError) as e:
+            print(f"[EMBED CACHE] Could not persist {self.matrix_path}: {e}")
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import logging
+import threading
+import warnings
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+import numpy as np
+
+from core.tracing import span
+
+# Suppress noisy startup warnings
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+MODEL_NAME = os.getenv("GENIE_EMBED_MODEL", "all-MiniLM-L6-v2")
+# torch (SentenceTransformer) or onnx (int8 model, see core/onnx_embedder.py)
+EMBED_BACKEND = os.getenv("GENIE_EMBED_BACKEND", "torch")
+# core/embed_server.py listens here; empty disables the client
+EMBED_SOCKET = os.getenv("GENIE_EMBED_SOCKET", "/tmp/genie_embed.sock")
+# Texts per encode call for bulk ingestion (ingest_many)
+INGEST_BATCH = int(os.getenv("GENIE_INGEST_BATCH", "64"))
+
+class EmbeddingProvider:
+    """
+    One embedding model per process, shared by the router, the vector
+    engine and the vector store. The backend is PyTorch SentenceTransformer
+    or, with GENIE_EMBED_BACKEND=onnx, the int8 ONNX export.
+
+    encode() is safe to call from any thread. Calls that arrive while the
+    model is busy (or within GENIE_EMBED_BATCH_WAIT_MS of each other) are
+    merged into a single forward pass of up to GENIE_EMBED_MAX_BATCH texts.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, model=None, max_batch=None, max_wait=None, backend=None):
+        self.model_name = model_name
+        self.backend = backend or EMBED_BACKEND
+        self.max_batch = max(1, max_batch or int(os.getenv("GENIE_EMBED_MAX_BATCH", "64")))
+        if max_wait is None:
+            max_wait = float(os.getenv("GENIE_EMBED_BATCH_WAIT_MS", "2")) / 1000
+        self.max_wait = max_wait
+        self._model = model
+        # Backend of the loaded model; onnx may have fallen back to torch
+        self.loaded_backend = None if model is None else self.backend
+        self._load_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._worker = None
+        self.batches = 0  # forward passes run, for stats
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        if self.backend == "onnx":
+            try:
+                from core.onnx_embedder import ONNX_MODEL_DIR, OnnxSentenceEncoder
+                print(f"[*] Loading ONNX int8 embedding model from {ONNX_MODEL_DIR}...")
+                encoder = OnnxSentenceEncoder(ONNX_MODEL_DIR)
+                self.loaded_backend = "onnx"
+                return encoder
+            except Exception as e:
+                print(f"[EMBED] ONNX backend unavailable ({e}); falling back to PyTorch")
+
+        warnings.filterwarnings("ignore")
+        logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
+        logging.getLogger("transformers").setLevel(logging.ERROR)
+        from sentence_transformers import SentenceTransformer
+        print(f"[*] Loading embedding model {self.model_name}...")
+        encoder = SentenceTransformer(self.model_name)
+        self.loaded_backend = "torch"
+        return encoder
+
+    def model_key(self):
+        """Identifies the vector space: model name plus the backend that actually loaded."""
+        self.model  # loads it
+        return f"{self.model_name}@{self.loaded_backend}"
+
+    def encode(self, texts):
+        """
+        Same contract as SentenceTransformer.encode: a str gives a 1-D
+        float32 vector, a list gives an (n, dim) float32 matrix.
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, self.dimension()), dtype=np.float32)
+
+        future = Future()
+        self._ensure_worker()
+        self._requests.put((batch, future))
+        vectors = future.result()
+        return vectors[0] if single else vectors
+
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._load_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="genie-embedder", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        """Blocks for one request, then gathers whatever else fits in the batch."""
+        pending = [self._requests.get()]
+        size = len(pending[0][0])
+        while size < self.max_batch:
+            try:
+                item = self._requests.get(timeout=self.max_wait) if self.max_wait else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                vectors = np.asarray(self.model.encode(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            offset = 0
+            for batch, future in pending:
+                future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+def send_frame(sock, payload):
+    sock.sendall(struct.pack("!I", len(payload)) + payload)
+
+def recv_frame(sock):
+    """Reads one length-prefixed frame; None on a clean EOF."""
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    payload = _recv_exact(sock, struct.unpack("!I", header)[0])
+    if payload is None:
+        raise ConnectionError("Connection closed mid-frame")
+    return payload
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+class RemoteEmbedder:
+    """
+    Client of the embedding server (python -m core.embed_server), with the
+    same encode() contract as EmbeddingProvider. While the server is
+    unreachable it encodes with an in-process model and retries the server
+    every RETRY_INTERVAL seconds.
+    """
+    RETRY_INTERVAL = 30
+
+    def __init__(self, path=EMBED_SOCKET, timeout=60):
+        self.path = path
+        self.timeout = timeout
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._down_until = 0
+        self._dimension = None
+        self._server_key = None  # model_key() of the server, from its replies
+        self._conn = threading.local()
+
+    def encode(self, texts):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, self.dimension()), dtype=np.float32)
+        if time.time() >= self._down_until:
+            try:
+                vectors = self._request(batch)
+            except (OSError, ValueError) as e:
+                print(f"[EMBED] Server at {self.path} unavailable ({e}); using the in-process model")
+                self._down_until = time.time() + self.RETRY_INTERVAL
+            else:
+                self._down_until = 0
+                return vectors[0] if single else vectors
+        return self.local().encode(texts)
+
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = int(self.encode(["dimension probe"]).shape[1])
+        return self._dimension
+
+    def model_key(self):
+        """The server's model_key(), or the in-process model's while the server is down."""
+        if self._server_key is None and time.time() >= self._down_until:
+            self.encode(["model probe"])
+        if self._server_key is not None and time.time() >= self._down_until:
+            return self._server_key
+        return self.local().model_key()
+
+    def local(self):
+        with self._local_lock:
+            if self._local is None:
+                self._local = EmbeddingProvider()
+            return self._local
+
+    def _connection(self):
+        sock = getattr(self._conn, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._conn.sock = sock
+        return sock
+
+    def _request(self, batch):
+        # One retry on a fresh connection covers a server restart
+        for attempt in (0, 1):
+            sock = self._connection()
+            try:
+                send_frame(sock, json.dumps({"texts": batch}).encode("utf-8"))
+                header = recv_frame(sock)
+                if header is None:
+                    raise ConnectionError("Server closed the connection")
+                header = json.loads(header)
+                if "error" in header:
+                    raise RuntimeError(f"Embedding server error: {header['error']}")
+                data = recv_frame(sock)
+                if data is None:
+                    raise ConnectionError("Server closed the connection")
+                self._server_key = header.get("model")
+                return np.frombuffer(data, dtype=np.float32).reshape(header["shape"]).copy()
+            except (OSError, ConnectionError):
+                sock.close()
+                self._conn.sock = None
+                if attempt:
+                    raise
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """Process-wide embedder: the embedding server client, or a local model."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = RemoteEmbedder(EMBED_SOCKET) if EMBED_SOCKET else EmbeddingProvider()
+        return _embedder
+
+# The user input of the request being handled, and its vector once computed
+_query = contextvars.ContextVar("genie_query", default=None)
+
+@contextmanager
+def query_scope(text):
+    """
+    Marks `text` as the query of the current request: inside the block,
+    embed_query(text) runs the model at most once, whoever asks first
+    (router, RAG search, response cache).
+    """
+    token = _query.set({"text": text, "vector": None})
+    try:
+        yield
+    finally:
+        _query.reset(token)
+
+def embed_query(text):
+    """Vector for `text`, reusing the request's query vector when it matches."""
+    slot = _query.get()
+    if slot is None or slot["text"] != text:
+        return get_embedder().encode(text)
+    if slot["vector"] is None:
+        with span("embed.query"):
+            slot["vector"] = get_embedder().encode(text)
+    return slot["vector"]
+
+def encode_batches(encoder, texts, batch_size=None):
+    """Yields (start, vectors) for consecutive slices of texts, one encode call each."""
+    batch_size = max(1, batch_size or INGEST_BATCH)
+    for start in range(0, len(texts), batch_size):
+        yield start, np.asarray(encoder.encode(texts[start:start + batch_size]), dtype=np.float32)
+
+def report_ingest(count, started):
+    elapsed = max(time.time() - started, 1e-9)
+    print(f"[MEMORY] Ingested {count} docs in {elapsed:.2f}s ({count / elapsed:.1f} docs/sec)")
@@ -4,15 +4,15 @@ from core.vector_store import VectorStore
 
 def ingest_all():
     store = VectorStore()
-    chunk_count = 0
+    texts, sources = [], []
 
     # 2. Ingest SOUL
     soul_path = "SOUL.md"
     if os.path.exists(soul_path):
         with open(soul_path, "r") as f:
             content = f.read()
-            store.ingest(content, "project_soul")
-            chunk_count += 1
+            texts.append(content)
+            sources.append("project_soul")
 
     # 3. Ingest DNA (Granularly)
     gemini_path = "GEMINI.md"
@@ -23,8 +23,8 @@ def ingest_all():
             sections = re.split(r'\n(?=## )', content)
             for i, section in enumerate(sections):
                 if section.strip():
-                    store.ingest(section.strip(), f"dna_section_{i}")
-                    chunk_count += 1
+                    texts.append(section.strip())
+                    sources.append(f"dna_section_{i}")
 
     # 4. Ingest Agent Info
     agents_dir = "agents"
@@ -36,10 +36,12 @@ def ingest_all():
                 if os.path.exists(agent_dna_path):
                     with open(agent_dna_path, "r") as f:
                         content = f.read()
-                        store.ingest(content, f"agent_{name}_dna")
-                        chunk_count += 1
+                        texts.append(content)
+                        sources.append(f"agent_{name}_dna")
 
-    print(f"Ingestion complete: [{chunk_count}] chunks saved to Redis DB 1.")
+    # One encode per GENIE_INGEST_BATCH chunks, one pipelined write per batch
+    chunk_count = store.ingest_many(texts, sources)
+    print(f"Ingestion complete: [{chunk_count}] chunks saved to {store.location()}.")
 
 if __name__ == "__main__":
     ingest_all()
\ No newline at end of file
@@ -0,0 +1,56 @@
+from collections import deque
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick multi-pattern matcher: finds every keyword occurring in a
+    text in one pass, however many keywords there are. Matching is case
+    insensitive.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]    # state -> {char: state}
+        self._fail = [0]
+        self._output = [[]]  # state -> keywords ending here
+        for keyword in keywords:
+            self._add(keyword.lower())
+        self._link()
+
+    def _add(self, keyword):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = nxt
+            state = nxt
+        self._output[state].append(keyword)
+
+    def _link(self):
+        """Breadth-first failure links; outputs are merged along them."""
+        queue = deque(self._goto[0].values())  # depth 1 fails to the root
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def findall(self, text):
+        """Set of keywords (lowercased) occurring in text."""
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found.update(self._output[state])
+        return found
@@ -0,0 +1,96 @@
+"""
+Priority lanes for the user inbox.
+
+Producers push to genie:user:inbox:<lane> (high, normal, bulk); the legacy
+genie:user:inbox key is still consumed as part of the normal lane. The
+master pops with strict priority by default, or weighted round robin with
+GENIE_LANE_MODE=weighted and GENIE_LANE_WEIGHTS=high:6,normal:3,bulk:1.
+
+    python -m core.lanes     # print per-lane queue depth
+"""
+import os
+import json
+
+LEGACY_INBOX = "genie:user:inbox"
+LANES = ("high", "normal", "bulk")  # highest priority first
+DEFAULT_WEIGHTS = "high:6,normal:3,bulk:1"
+
+def lane_key(lane):
+    return f"{LEGACY_INBOX}:{lane}"
+
+def lane_keys(lane):
+    """Redis keys that make up a lane, in pop order."""
+    if lane == "normal":
+        return [lane_key(lane), LEGACY_INBOX]
+    return [lane_key(lane)]
+
+def lane_of(key):
+    if key == LEGACY_INBOX:
+        return "normal"
+    return key.rsplit(":", 1)[-1]
+
+def push_request(r, payload, lane="normal"):
+    """Queues a user request on the given lane (sync redis client)."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}', expected one of {LANES}")
+    payload = {**payload, "lane": lane}
+    r.rpush(lane_key(lane), json.dumps(payload))
+
+def lane_depths(r):
+    """Number of queued requests per lane."""
+    pipe = r.pipeline()
+    for lane in LANES:
+        for key in lane_keys(lane):
+            pipe.llen(key)
+    counts = iter(pipe.execute())
+    return {lane: sum(next(counts) for _ in lane_keys(lane)) for lane in LANES}
+
+def parse_weights(spec):
+    weights = {}
+    for part in spec.split(","):
+        if ":" in part:
+            lane, weight = part.split(":", 1)
+            weights[lane.strip()] = max(0, int(weight))
+    return {lane: weights.get(lane, 1) for lane in LANES}
+
+class LaneScheduler:
+    """
+    Decides which lane the next pop should prefer.
+
+    strict:   always high > normal > bulk.
+    weighted: smooth weighted round robin, so with every lane non-empty the
+              pops are split by weight; the remaining lanes follow in
+              priority order so an empty preferred lane never blocks.
+    """
+
+    def __init__(self, mode=None, weights=None):
+        self.mode = (mode or os.getenv("GENIE_LANE_MODE", "strict")).lower()
+        self.weights = parse_weights(weights or os.getenv("GENIE_LANE_WEIGHTS", DEFAULT_WEIGHTS))
+        self._current = {lane: 0 for lane in LANES}
+
+    def keys(self):
+        """BLPOP key order for the next pop (BLPOP serves the first non-empty key)."""
+        order = list(LANES)
+        if self.mode == "weighted":
+            preferred = max(LANES, key=lambda lane: (self._current[lane] + self.weights[lane], -LANES.index(lane)))
+            order.remove(preferred)
+            order.insert(0, preferred)
+        return [key for lane in order for key in lane_keys(lane)]
+
+    def served(self, lane):
+        """Accounts a pop from `lane` (weighted mode)."""
+        if self.mode != "weighted":
+            return
+        total = sum(self.weights.values())
+        for name in LANES:
+            self._current[name] += self.weights[name]
+        self._current[lane] -= total
+
+def main():
+    import redis
+    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/1"), decode_responses=True)
+    for lane, depth in lane_depths(r).items():
+        print(f"{lane:<8}{depth:>6}")
+
+if __name__ == "__main__":
+    main()
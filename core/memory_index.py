@@ -0,0 +1,229 @@
+import os
+import threading
+import numpy as np
+from core.ann_index import ANN_DIR, ANN_MIN_ROWS, TRAIN_SAMPLE, IVFIndex, top_k_rows
+from core.embedding_cache import model_key
+
+# Bumped by every writer of genie:mem:* so other processes know to reload
+MEMORY_VERSION_KEY = "genie:mem_version"
+SCAN_BATCH = 500
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+class MemoryIndex:
+    """
+    In-memory brute-force index over the genie:mem:* hashes, used when
+    RediSearch is not available.
+
+    All vectors live in one contiguous, pre-normalized float32 matrix that
+    is loaded once (SCAN + pipelined HMGET) and then kept in sync by add().
+    A query is one matmul plus argpartition for the top k. Writes from
+    other processes are noticed through MEMORY_VERSION_KEY and trigger a
+    reload.
+
+    From GENIE_ANN_MIN_ROWS memories on, queries only score the rows of
+    the closest IVF lists (core/ann_index.py); centroids are trained in
+    the background and kept in GENIE_ANN_DIR.
+    """
+
+    def __init__(self, redis_client, prefix="genie:mem:", ann_path=None, ann_min_rows=None, encoder=None):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.texts = []
+        self.rows = {}       # redis key -> row
+        self.dim = None
+        self._matrix = None  # capacity-sized buffer; rows [0, size) are live
+        self._lists = None   # IVF list of each row, same capacity
+        self._version = None  # MEMORY_VERSION_KEY at the last load, None before
+        self._lock = threading.RLock()
+        self.ann = None
+        self.ann_path = ann_path or os.path.join(ANN_DIR, prefix.strip(":").replace(":", "_") + ".npy")
+        self.ann_min_rows = ann_min_rows or ANN_MIN_ROWS
+        self.encoder = encoder
+        self._model = None
+        self._training = False
+
+    @property
+    def model(self):
+        """model_key() of the encoder, resolved when centroids are first needed."""
+        if self._model is None:
+            self._model = model_key(self.encoder)
+        return self._model
+
+    @property
+    def size(self):
+        return len(self.texts)
+
+    def load(self):
+        """(Re)reads every memory hash; returns the number of vectors indexed."""
+        with self._lock:
+            version = self._current_version()
+            self.texts, self.rows, self.dim, self._matrix, self.ann = [], {}, None, None, None
+            batch = []
+            for key in self.redis.scan_iter(match=f"{self.prefix}*", count=SCAN_BATCH):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH:
+                    self._load_batch(batch)
+                    batch = []
+            if batch:
+                self._load_batch(batch)
+            self._version = version
+            if self.size >= self.ann_min_rows:
+                # Saved centroids are reused as long as the corpus has not outgrown them
+                ann = IVFIndex.load(self.ann_path, self.dim, self.model)
+                if ann is not None and not ann.stale(self.size):
+                    self._attach(ann)
+        if self._ann_due():
+            self.build_ann_async()
+        return self.size
+
+    def _load_batch(self, keys):
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, "text", "vector")
+        for key, (text, vector) in zip(keys, pipe.execute()):
+            if text is None or vector is None:
+                continue
+            self._put(_text(key), _text(text), np.frombuffer(vector, dtype=np.float32))
+
+    def add(self, key, text, vector):
+        """Indexes a memory just written to Redis by this process."""
+        with self._lock:
+            if self._version is None:
+                return  # not loaded yet; the first search reads it from Redis
+            self._put(key, text, np.asarray(vector, dtype=np.float32))
+        if self._ann_due():
+            self.build_ann_async()
+
+    def _put(self, key, text, vector):
+        if self.dim is None:
+            self.dim = vector.shape[0]
+        if vector.shape != (self.dim,):
+            return  # written by another model
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        row = self.rows.get(key)
+        if row is None:
+            row = self.size
+            self._reserve(row + 1)
+            self.rows[key] = row
+            self.texts.append(text)
+        else:
+            self.texts[row] = text
+        self._matrix[row] = vector / norm
+        if self.ann is not None:
+            self._lists[row] = self.ann.assign(self._matrix[row])[0]
+
+    def remove(self, key):
+        """Drops a memory deleted from Redis by this process (last row fills the hole)."""
+        with self._lock:
+            row = self.rows.pop(key, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                moved = next(k for k, r in self.rows.items() if r == last)
+                self.rows[moved] = row
+                self.texts[row] = self.texts[last]
+                self._matrix[row] = self._matrix[last]
+                self._lists[row] = self._lists[last]
+            self.texts.pop()
+
+    def _reserve(self, rows):
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if rows <= capacity:
+            return
+        grown = np.zeros((max(rows, capacity * 2, 64), self.dim), dtype=np.float32)
+        lists = np.zeros(len(grown), dtype=np.int32)
+        if capacity:
+            grown[:capacity] = self._matrix
+            lists[:capacity] = self._lists
+        self._matrix, self._lists = grown, lists
+
+    def _attach(self, ann):
+        self.ann = ann
+        self._lists[:self.size] = ann.assign(self._matrix[:self.size])
+
+    def _ann_due(self):
+        return self.size >= self.ann_min_rows and (self.ann is None or self.ann.stale(self.size))
+
+    def build_ann(self):
+        """Trains IVF centroids on (a sample of) the current rows, saves and attaches them."""
+        with self._lock:
+            rows = self.size
+            if not rows:
+                return False
+            sample = np.arange(rows)
+            if rows > TRAIN_SAMPLE:
+                sample = np.random.default_rng(0).choice(rows, TRAIN_SAMPLE, replace=False)
+            vectors = self._matrix[sample]  # a copy: adds may continue meanwhile
+        ann = IVFIndex.train(vectors, rows=rows, model=self.model)
+        ann.save(self.ann_path)
+        with self._lock:
+            if self.dim != ann.dim:
+                return False  # reloaded with another model meanwhile
+            self._attach(ann)
+        print(f"[MEMORY] Trained {ann.nlist} IVF lists on {rows} memories")
+        return True
+
+    def build_ann_async(self):
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+        threading.Thread(target=self._build_ann_in_background, name="genie-ann-train", daemon=True).start()
+
+    def _build_ann_in_background(self):
+        try:
+            self.build_ann()
+        except Exception as e:
+            print(f"[MEMORY] IVF training failed: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    def _current_version(self):
+        version = self.redis.get(MEMORY_VERSION_KEY)
+        return int(version) if version else 0
+
+    def written(self):
+        """
+        Bumps MEMORY_VERSION_KEY after a local write (add() already indexed
+        it). If the new version is not the next one, someone else wrote
+        too and we reload.
+        """
+        version = self.redis.incr(MEMORY_VERSION_KEY)
+        with self._lock:
+            if self._version is None:
+                return
+            if version == self._version + 1:
+                self._version = version
+                return
+        self.load()
+
+    def refresh(self):
+        """Loads on first use, and again whenever another process wrote."""
+        if self._version is None or self._current_version() != self._version:
+            self.load()
+
+    def search(self, query_vector, top_k=3, nprobe=None, exact=False):
+        """
+        Top k (text, cosine similarity) pairs, best first. Goes through the
+        IVF index when there is one, unless exact=True (brute force).
+        """
+        with self._lock:
+            n = self.size
+            if not n or top_k <= 0:
+                return []
+            query = np.asarray(query_vector, dtype=np.float32)
+            if query.shape != (self.dim,):
+                return []
+            query = query / max(np.linalg.norm(query), 1e-8)
+            if self.ann is None or exact:
+                sims = self._matrix[:n] @ query
+                return [(self.texts[i], float(sims[i])) for i in top_k_rows(sims, top_k)]
+            rows = np.flatnonzero(self.ann.probe(query, nprobe)[self._lists[:n]])
+            sims = self._matrix[rows] @ query
+            return [(self.texts[rows[i]], float(sims[i])) for i in top_k_rows(sims, top_k)]
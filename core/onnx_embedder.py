@@ -0,0 +1,167 @@
+"""
+ONNX Runtime backend for the MiniLM sentence embeddings (CPU, int8).
+
+Selected with GENIE_EMBED_BACKEND=onnx; needs `onnxruntime` and `tokenizers`
+but not torch. The model directory is produced once with:
+
+    python -m core.onnx_embedder export          # fp32 export + dynamic int8 quantization
+    python -m core.onnx_embedder check           # cosine agreement + speed vs. PyTorch
+
+export and check need torch/sentence-transformers; serving does not.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+ONNX_MODEL_DIR = os.getenv("GENIE_ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+ONNX_MODEL_FILE = "model_int8.onnx"
+MAX_SEQ_LENGTH = 256  # sentence-transformers' setting for all-MiniLM-L6-v2
+
+def mean_pool_normalize(hidden, attention_mask):
+    """Mean over real tokens, then L2 normalize (the model's Pooling + Normalize)."""
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+def cosine_agreement(reference, candidate):
+    """Row-wise cosine similarity between two embedding matrices."""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return (ref * cand).sum(axis=1)
+
+class OnnxSentenceEncoder:
+    """Drop-in for SentenceTransformer.encode backed by onnxruntime."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        threads = threads or int(os.getenv("GENIE_ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = None
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            feed = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            feed = {k: v for k, v in feed.items() if k in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            chunks.append(mean_pool_normalize(hidden, feed["attention_mask"]))
+        vectors = np.vstack(chunks) if chunks else np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            dim = self.session.get_outputs()[0].shape[-1]
+            self._dimension = dim if isinstance(dim, int) else int(self.encode(["x"]).shape[1])
+        return self._dimension
+
+def hub_name(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+def export(model_name, out_dir):
+    """Exports the transformer to ONNX and writes a dynamically int8-quantized copy."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(hub_name(model_name))
+    model = AutoModel.from_pretrained(hub_name(model_name)).eval()
+
+    sample = tokenizer(["export sample sentence"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in names),
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    print(f"[✓] Exported {model_name} to {out_dir} ({ONNX_MODEL_FILE})")
+
+SAMPLE_QUERIES = [
+    "draw picture", "generate image", "画一张猫", "post to x", "发个动态",
+    "check system status", "系统状态", "scrape website", "send me the image", "把图发给我",
+]
+
+def sample_texts():
+    """Router-style queries plus the paragraphs of the docs that get ingested."""
+    texts = list(SAMPLE_QUERIES)
+    for path in ("SOUL.md", "GEMINI.md"):
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                texts.extend(p.strip() for p in f.read().split("\n\n") if p.strip())
+    return texts
+
+def throughput(encode, texts, rounds=3):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(texts)
+    return rounds * len(texts) / (time.perf_counter() - start)
+
+def check(model_name, model_dir, threshold):
+    """Compares ONNX int8 against the PyTorch model; returns True when they agree."""
+    from sentence_transformers import SentenceTransformer
+
+    texts = sample_texts()
+    reference_model = SentenceTransformer(model_name)
+    onnx_model = OnnxSentenceEncoder(model_dir)
+
+    reference = np.asarray(reference_model.encode(texts), dtype=np.float32)
+    candidate = onnx_model.encode(texts)
+    cosines = cosine_agreement(reference, candidate)
+
+    print(f"texts:            {len(texts)}")
+    print(f"cosine mean:      {cosines.mean():.4f}")
+    print(f"cosine min:       {cosines.min():.4f} (threshold {threshold})")
+    torch_rate = throughput(reference_model.encode, texts)
+    onnx_rate = throughput(onnx_model.encode, texts)
+    print(f"torch:            {torch_rate:.1f} texts/s")
+    print(f"onnx int8:        {onnx_rate:.1f} texts/s ({onnx_rate / torch_rate:.1f}x)")
+    return cosines.min() >= threshold
+
+def main():
+    from core.embeddings import MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="ONNX int8 embedding backend tools")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--threshold", type=float, default=0.98, help="Minimum per-text cosine for check")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, args.dir)
+    elif not check(args.model, args.dir, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
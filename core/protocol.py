@@ -97,11 +97,43 @@ class AgentMesh:
                 else:
                     continue
 
+# Env var naming the fd of the structured event channel opened by master.py
+EVENT_FD_ENV = "GENIE_EVENT_FD"
+
+# Free-text markers older masters scan stdout for, per event type
+LEGACY_MARKERS = {
+    "telegram_summary": "TELEGRAM_SUMMARY: {text}",
+    "image_generated": "IMAGE_GENERATED: {path}",
+    "publish_succeeded": "{message}",
+    "publish_failed": "{message}",
+}
+
 class AgentResponse:
+    @staticmethod
+    def emit(event_type, **data):
+        """
+        Reports a structured event to the master as one JSON line on the
+        event channel. Events with a legacy marker are also printed to
+        stdout so the text transcript (and older masters) still see them.
+        """
+        event = {"event": event_type, **data}
+        template = LEGACY_MARKERS.get(event_type)
+        if template:
+            print(template.format(**data), flush=True)
+
+        fd = os.getenv(EVENT_FD_ENV)
+        if not fd:
+            return
+        try:
+            os.write(int(fd), (json.dumps(event) + "\n").encode("utf-8"))
+        except (OSError, ValueError):
+            pass
+
     @staticmethod
     def success(msg, data=None, publish_event=None):
         """Prints message and JSON data, then exits with 0."""
         print(msg)
+        AgentResponse.emit("success", message=msg)
         
         # Optional: Auto-publish event on success
         if publish_event:
@@ -125,6 +157,7 @@ class AgentResponse:
     def error(msg, data=None):
         """Prints error message and data, then exits with 1."""
         print(f"CRITICAL_ERROR: {msg}")
+        AgentResponse.emit("error", message=msg)
         if data:
             print(json.dumps(data))
         sys.exit(1)
@@ -0,0 +1,91 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class SemanticResponseCache:
+    """
+    Opt-in cache of final answers, keyed by the embedding of the user input
+    plus a hash of the surrounding context (SOUL, RAG, router hint).
+
+    A lookup hits when an unexpired entry with the same context hash has a
+    cosine similarity >= threshold. Entries expire after ttl seconds and the
+    least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, encode, threshold=None, ttl=None, max_entries=None):
+        self.encode = encode
+        self.threshold = threshold or float(os.getenv("GENIE_CACHE_THRESHOLD", "0.95"))
+        self.ttl = ttl or float(os.getenv("GENIE_CACHE_TTL", "3600"))
+        self.max_entries = max_entries or int(os.getenv("GENIE_CACHE_MAX_ENTRIES", "500"))
+
+        self._entries = OrderedDict()  # id -> entry dict, LRU order
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def context_key(context):
+        return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+    def _vector(self, user_input):
+        vec = np.asarray(self.encode(user_input), dtype=np.float32)
+        return vec / (np.linalg.norm(vec) + 1e-8)
+
+    def lookup(self, user_input, context):
+        """Returns the cached response for a similar question, or None."""
+        query = self._vector(user_input)
+        key = self.context_key(context)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if entry["context"] != key:
+                    continue
+                score = float(np.dot(entry["vector"], query))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            return {"response": entry["response"], "similarity": best_score, "latency": entry["latency"]}
+
+    def store(self, user_input, context, response, latency):
+        """Caches a final response that took `latency` seconds to produce."""
+        vector = self._vector(user_input)
+        with self._lock:
+            self._entries[self._next_id] = {
+                "vector": vector,
+                "context": self.context_key(context),
+                "response": response,
+                "latency": latency,
+                "created": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+            }
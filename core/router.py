@@ -1,5 +1,112 @@
+import os
+import time
+import threading
+from collections import Counter, defaultdict
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from core.embeddings import get_embedder, embed_query
+from core.embedding_cache import EmbeddingCache
+from core.keyword_automaton import KeywordAutomaton
+
+ROUTES_PATH = os.getenv("GENIE_ROUTES_FILE", "config/routes.yaml")
+RELOAD_CHECK_INTERVAL = 1.0  # seconds between routes file mtime checks
+# A semantic layer that failed to build is retried after 5s, 10s, ... up to this
+WARM_RETRY_MAX = 300
+
+# Used when config/routes.yaml is missing
+DEFAULT_ROUTES = {
+    "imggen": {
+        "priority": 40,
+        "keywords": ["画", "生图"],
+        "phrases": ["draw picture", "generate image", "pixar render", "画图", "生图", "画一张"],
+    },
+    "socialpub": {
+        "priority": 30,
+        "keywords": ["发布", "推特", "发个推"],
+        "phrases": ["post to x", "tweet", "publish to twitter", "发布到X", "发推", "发个动态"],
+    },
+    "sys_check": {
+        "priority": 20,
+        "keywords": ["状态", "目录", "存活"],
+        "phrases": ["check system", "system status", "health check", "系统状态", "检查状态", "运行情况"],
+    },
+    "reader_agent": {
+        "phrases": ["scrape website", "read content", "scan url", "抓取网页", "阅读内容", "提取文本"],
+    },
+    "artifact_retrieval": {
+        "priority": 10,
+        "keywords": ["找", "发给我", "图片"],
+        "phrases": ["send me the image", "find my last picture", "show me the file", "回复刚才的图", "把图发给我", "查看生成的作品"],
+    },
+}
+DEFAULT_THRESHOLD = 0.5
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-8)
+
+class RouteTable:
+    """
+    All route phrases as one pre-normalized matrix, grouped by route, so a
+    query is scored with one matmul plus a segment max (np.maximum.reduceat).
+    """
+
+    def __init__(self, names, offsets, matrix, threshold):
+        self.names = names        # route names, in matrix order
+        self.offsets = offsets    # first row of each route in matrix
+        self.matrix = matrix      # (phrases, dim), rows L2-normalized
+        self.threshold = threshold
+
+    def best(self, query_vectors):
+        """Best route (or None) for each row of query_vectors."""
+        if not self.names:
+            return [None] * len(query_vectors)
+        sims = normalize_rows(query_vectors) @ self.matrix.T
+        scores = np.maximum.reduceat(sims, self.offsets, axis=1)
+        winners = scores.argmax(axis=1)
+        return [
+            self.names[w] if scores[i, w] > self.threshold else None
+            for i, w in enumerate(winners)
+        ]
+
+def parse_route(spec):
+    """Normalizes a route entry: keywords may be a list (weight 1) or {keyword: weight}."""
+    spec = spec or {}
+    keywords = spec.get("keywords") or {}
+    if not isinstance(keywords, dict):
+        keywords = {k: 1.0 for k in keywords}
+    return {
+        "phrases": list(spec.get("phrases") or []),
+        "keywords": {str(k).lower(): float(w) for k, w in keywords.items()},
+        "priority": int(spec.get("priority", 0)),
+        "min_score": float(spec.get("min_score", 1.0)),
+    }
+
+class KeywordLayer:
+    """
+    Keyword quick-route compiled into one Aho-Corasick automaton. A route
+    fires when the weights of its keywords found in the text reach its
+    min_score; among fired routes the highest priority wins, then the
+    highest score.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.owners = defaultdict(list)  # keyword -> [(route, weight)]
+        for name, spec in routes.items():
+            for keyword, weight in spec["keywords"].items():
+                self.owners[keyword].append((name, weight))
+        self.automaton = KeywordAutomaton(self.owners)
+
+    def route(self, text):
+        scores = defaultdict(float)
+        for keyword in self.automaton.findall(text):
+            for name, weight in self.owners[keyword]:
+                scores[name] += weight
+        fired = [name for name, score in scores.items() if score >= self.routes[name]["min_score"]]
+        if not fired:
+            return None
+        return max(fired, key=lambda name: (self.routes[name]["priority"], scores[name]))
 
 class GenieRouter:
     _instance = None
@@ -10,54 +117,175 @@ class GenieRouter:
             cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, lazy=False):
+        """lazy=True builds only the keyword layer; the semantic table waits for warm()."""
         if self._initialized: return
         
         print("[*] Initializing Genie Precision Router (V2)...")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # CORE KEYWORDS ONLY - Reduce semantic overlap
-        self.route_data = {
-            "imggen": ["draw picture", "generate image", "pixar render", "画图", "生图", "画一张"],
-            "socialpub": ["post to x", "tweet", "publish to twitter", "发布到X", "发推", "发个动态"],
-            "sys_check": ["check system", "system status", "health check", "系统状态", "检查状态", "运行情况"],
-            "reader_agent": ["scrape website", "read content", "scan url", "抓取网页", "阅读内容", "提取文本"],
-            "artifact_retrieval": ["send me the image", "find my last picture", "show me the file", "回复刚才的图", "把图发给我", "查看生成的作品"]
-        }
-        
-        self.reference_embeddings = {}
-        for name, texts in self.route_data.items():
-            self.reference_embeddings[name] = self.model.encode(texts)
-            
+        # Shared with the vector engine/store (one model per process)
+        self.model = get_embedder()
+        self.routes_path = ROUTES_PATH
+        # Phrase vectors persist across reloads and restarts
+        self.phrase_cache = EmbeddingCache("routes", encoder=self.model)
+        self._mtime = None
+        self._next_check = 0
+        self._reload_lock = threading.Lock()  # guards the layer swap and hit counters
+        self._build_lock = threading.Lock()   # one rebuild at a time; requests never wait on it
+        self._hits = Counter()  # layer -> queries resolved there
+        self.semantic = not lazy
+        self.table = None  # None until the semantic layer is built
+        self._retry_at = None  # when to retry a failed semantic build
+        self._retry_delay = 0
+        self.reload(force=True)
+
         self._initialized = True
-        print("[✓] Genie Precision Router Ready.")
+        print("[✓] Genie Precision Router Ready." if self.semantic else "[✓] Genie Router Ready (keyword only, semantic layer warming).")
 
-    def guide(self, text):
+    def warm(self):
+        """Builds the semantic layer (encodes or loads the route phrases)."""
+        if self.table is None:
+            self.semantic = True
+            self.reload(force=True)
+
+    def load_routes(self):
+        """Reads (routes, threshold) from the routes file, or the built-in defaults."""
+        if not os.path.exists(self.routes_path):
+            routes, threshold = DEFAULT_ROUTES, DEFAULT_THRESHOLD
+        else:
+            import yaml
+            with open(self.routes_path, "r") as f:
+                config = yaml.safe_load(f) or {}
+            routes = config.get("routes") or {}
+            threshold = float(config.get("threshold", DEFAULT_THRESHOLD))
+        return {name: parse_route(spec) for name, spec in routes.items()}, threshold
+
+    def reload(self, force=False, blocking=True):
+        """
+        Rebuilds both layers when the routes file changed; only unseen
+        phrases are encoded. The new layers are built off to the side and
+        swapped in, so classify() keeps using the old ones meanwhile. With
+        blocking=False a rebuild already in progress elsewhere is not waited for.
+        """
+        if not self._build_lock.acquire(blocking=blocking):
+            return
+        try:
+            mtime = os.path.getmtime(self.routes_path) if os.path.exists(self.routes_path) else None
+            if not force and mtime == self._mtime:
+                return
+            try:
+                routes, threshold = self.load_routes()
+            except Exception as e:
+                print(f"[ROUTER] Failed to load {self.routes_path}: {e}")
+                self._mtime = mtime
+                return
+
+            keywords = KeywordLayer(routes)
+            table = self._build_semantic(routes, threshold) if self.semantic else None
+            with self._reload_lock:
+                self.route_data = {name: spec["phrases"] for name, spec in routes.items()}
+                self.keywords = keywords
+                if table is not None:
+                    self.table = table
+            if not force:
+                print(f"[ROUTER] Reloaded {len(routes)} routes")
+            self._mtime = mtime
+        finally:
+            self._build_lock.release()
+
+    def _build_semantic(self, routes, threshold):
+        """build_table(), or None after scheduling a retry with backoff when it fails."""
+        try:
+            table = self.build_table(routes, threshold)
+        except Exception as e:
+            self._retry_delay = min(self._retry_delay * 2 or 5, WARM_RETRY_MAX)
+            self._retry_at = time.time() + self._retry_delay
+            print(f"[ROUTER] Semantic layer failed to build ({e}); retrying in {self._retry_delay}s")
+            return None
+        if self._retry_delay:
+            print("[ROUTER] Semantic layer built on retry")
+        self._retry_at, self._retry_delay = None, 0
+        return table
+
+    def build_table(self, routes, threshold):
+        names, offsets, phrases = [], [], []
+        for name, spec in routes.items():
+            if not spec["phrases"]:
+                continue  # keyword-only route
+            names.append(name)
+            offsets.append(len(phrases))
+            phrases.extend(spec["phrases"])
+        matrix = normalize_rows(self.phrase_cache.get_many(phrases, self.model.encode)) if phrases else np.zeros((0, 0), dtype=np.float32)
+        return RouteTable(names, np.array(offsets, dtype=np.intp), matrix, threshold)
+
+    def _maybe_reload(self):
+        now = time.time()
+        if self._retry_at is not None and now >= self._retry_at and self.table is None:
+            # Off the request path: the retry may have to load the model
+            self._retry_at = None
+            threading.Thread(target=self.reload, kwargs={"force": True, "blocking": False}, name="genie-router-retry", daemon=True).start()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            self.reload(blocking=False)
+
+    def keyword_route(self, text):
+        """Exact match quick-route (one pass of the keyword automaton)."""
+        self._maybe_reload()
+        return self.keywords.route(text)
+
+    def classify(self, text):
+        """Returns (route or None, layer) where layer is keyword, semantic, cold or none."""
         try:
             # 1. Exact match quick-route
-            if "画" in text or "生图" in text: return "imggen"
-            if "发布" in text or "推特" in text or "发个推" in text: return "socialpub"
-            if "状态" in text or "目录" in text or "存活" in text: return "sys_check"
-            if "找" in text or "发给我" in text or "图片" in text: return "artifact_retrieval"
-            
+            route = self.keyword_route(text)
+            if route:
+                return self._count(route, "keyword")
+            if self.table is None:
+                # Semantic layer still warming up: don't block on the model
+                return self._count(None, "cold")
+
             # 2. Semantic fallback
-            query_vec = self.model.encode([text])[0]
-            best_route = None
-            max_score = 0
-            
-            for name, embs in self.reference_embeddings.items():
-                dots = np.dot(embs, query_vec)
-                norms = np.linalg.norm(embs, axis=1) * np.linalg.norm(query_vec)
-                sims = dots / (norms + 1e-8)
-                score = np.max(sims)
-                if score > max_score:
-                    max_score = score
-                    best_route = name
-            
-            if max_score > 0.5:
-                return best_route
+            # Shared with RAG / the response cache for the same request
+            query_vec = embed_query(text)
+            route = self.table.best(query_vec[None, :])[0]
+            if route:
+                return self._count(route, "semantic")
         except Exception: pass
-        return None
+        return self._count(None, "none")
+
+    def guide(self, text):
+        return self.classify(text)[0]
+
+    def guide_batch(self, texts):
+        """guide() for many texts (e.g. replaying logs) with one encode call."""
+        results = [self.keyword_route(t) for t in texts]
+        pending = [i for i, route in enumerate(results) if route is None]
+        for route in results:
+            if route:
+                self._count(route, "keyword")
+        if pending and self.table is None:
+            for i in pending:
+                self._count(None, "cold")
+        elif pending:
+            vectors = self.model.encode([texts[i] for i in pending])
+            for i, route in zip(pending, self.table.best(vectors)):
+                results[i] = self._count(route, "semantic" if route else "none")[0]
+        return results
+
+    def _count(self, route, layer):
+        with self._reload_lock:
+            self._hits[layer] += 1
+        return route, layer
+
+    def stats(self):
+        """Per-layer resolution counts and hit rates."""
+        with self._reload_lock:
+            hits = dict(self._hits)
+        total = sum(hits.values())
+        stats = {"total": total}
+        for layer in ("keyword", "semantic", "cold", "none"):
+            stats[f"{layer}_hits"] = hits.get(layer, 0)
+            stats[f"{layer}_rate"] = round(hits.get(layer, 0) / total, 4) if total else 0.0
+        return stats
 
 if __name__ == "__main__":
     router = GenieRouter()
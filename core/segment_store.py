@@ -0,0 +1,418 @@
+"""
+Append-only, memory-mapped vector segments: VectorStore's local backend
+(GENIE_VECTOR_BACKEND=segments).
+
+    <dir>/manifest.json  {"dim", "dtype", "segments": [names, oldest first], "next"}
+    <dir>/<seg>.vec      raw rows of `dim` L2-normalized float32/float16 values
+    <dir>/<seg>.jsonl    one {"id", "text"} line per row; {"id", "deleted": true}
+                         is a tombstone (its vector row is zeros)
+
+Rows are ordered by (segment, row) and the last row of an id wins, so
+re-ingesting an id overwrites it and a tombstone deletes it. Only the last
+segment is appended to; the others are immutable and get merged in the
+background. Searchers map the files read-only, so every process on the host
+shares the same pages.
+
+Once a store holds GENIE_ANN_MIN_ROWS live rows, searches go through an
+IVF index (core/ann_index.py) whose centroids are kept in <dir>/ivf.npy.
+
+    python -m core.segment_store stats|merge|ann
+"""
+import os
+import sys
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+from core.ann_index import ANN_MIN_ROWS, TRAIN_SAMPLE, IVFIndex, top_k_rows
+
+SEGMENT_DIR = os.getenv("GENIE_SEGMENT_DIR", "data/vectors")
+SEGMENT_DTYPE = os.getenv("GENIE_SEGMENT_DTYPE", "float32")
+SEGMENT_ROWS = int(os.getenv("GENIE_SEGMENT_ROWS", "4096"))
+# Sealed segments tolerated before a background merge
+MAX_SEALED = int(os.getenv("GENIE_SEGMENT_MAX_SEALED", "4"))
+
+class Segment:
+    """One .vec/.jsonl pair, mapped read-only. Only the active one grows."""
+
+    def __init__(self, directory, name, dim, dtype):
+        self.name = name
+        self.vec_path = os.path.join(directory, f"{name}.vec")
+        self.meta_path = os.path.join(directory, f"{name}.jsonl")
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.ids = []
+        self.texts = []      # None for tombstones
+        self.alive = np.zeros(0, dtype=bool)
+        self.lists = np.zeros(0, dtype=np.int32)  # IVF list of each row
+        self.matrix = None
+        self._meta_offset = 0
+
+    @property
+    def rows(self):
+        return 0 if self.matrix is None else len(self.matrix)
+
+    def refresh(self):
+        """Maps rows appended since the last call; returns their range."""
+        start = self.rows
+        with open(self.meta_path, "rb") as f:
+            f.seek(self._meta_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # a writer may be mid-line
+        self._meta_offset += len(complete)
+        for line in complete.splitlines():
+            record = json.loads(line)
+            self.ids.append(record["id"])
+            self.texts.append(None if record.get("deleted") else record["text"])
+        # The vector is written before its sidecar line
+        row_bytes = self.dim * self.dtype.itemsize
+        rows = min(len(self.ids), os.path.getsize(self.vec_path) // row_bytes)
+        if rows != start:
+            self.matrix = np.memmap(self.vec_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+            self.alive = np.concatenate([self.alive, np.zeros(rows - start, dtype=bool)])
+        return start, rows
+
+    def top(self, query, k, probe=None):
+        """Best k live rows as (score, text) pairs; with a probe mask only rows of those IVF lists."""
+        if probe is None:
+            n = int(self.alive.sum())
+            if not n:
+                return []
+            sims = np.asarray(self.matrix, dtype=np.float32) @ query
+            sims[~self.alive] = -np.inf
+            return [(float(sims[i]), self.texts[i]) for i in top_k_rows(sims, min(k, n))]
+        rows = np.flatnonzero(self.alive & probe[self.lists])
+        if not len(rows):
+            return []
+        sims = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+        return [(float(sims[i]), self.texts[rows[i]]) for i in top_k_rows(sims, k)]
+
+class SegmentStore:
+    def __init__(self, directory=None, dtype=None, segment_rows=None, max_sealed=None, ann_min_rows=None):
+        self.directory = directory or SEGMENT_DIR
+        self.dtype = dtype or SEGMENT_DTYPE
+        self.segment_rows = segment_rows or SEGMENT_ROWS
+        self.max_sealed = max_sealed or MAX_SEALED
+        self.ann_min_rows = ann_min_rows or ANN_MIN_ROWS
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.ann_path = os.path.join(self.directory, "ivf.npy")
+        os.makedirs(self.directory, exist_ok=True)
+        self.dim = None
+        self.segments = []   # Segment objects in manifest order
+        self.live = {}       # id -> (Segment, row)
+        self.ann = None      # IVFIndex once trained
+        self._ann_version = None
+        self._manifest_text = None
+        self._lock = threading.RLock()
+        self._maintaining = False
+
+    # --- manifest / locking ---
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "dtype": self.dtype, "segments": [], "next": 0}
+
+    def _manifest_raw(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes writers and merges across processes."""
+        with open(os.path.join(self.directory, "LOCK"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # --- reading ---
+
+    def refresh(self):
+        """Picks up rows, segments and merges written by any process."""
+        with self._lock:
+            for _ in range(3):
+                text = self._manifest_raw()
+                if text is None or text == self._manifest_text:
+                    break
+                try:
+                    self._load_manifest(text)
+                    return
+                except FileNotFoundError:
+                    # A merge removed files under us: reload from scratch
+                    self.segments, self.live = [], {}
+            if self.segments:
+                self._refresh_segment(self.segments[-1])
+
+    def _refresh_segment(self, segment):
+        self._index_rows(segment, *segment.refresh())
+        self._assign(segment)
+
+    def _assign(self, segment):
+        """Brings segment.lists up to date with its rows."""
+        if self.ann is not None and len(segment.lists) < segment.rows:
+            segment.lists = np.concatenate([segment.lists, self.ann.assign(segment.matrix[len(segment.lists):])])
+
+    def _load_manifest(self, text):
+        manifest = json.loads(text)
+        self.dim, self.dtype = manifest["dim"], manifest["dtype"]
+        names = manifest["segments"]
+        current = [s.name for s in self.segments]
+        if names[:len(current)] == current:
+            # Only new segments were added: index them incrementally
+            if self.segments:
+                self._refresh_segment(self.segments[-1])
+            for name in names[len(current):]:
+                segment = Segment(self.directory, name, self.dim, self.dtype)
+                self.segments.append(segment)
+                self._refresh_segment(segment)
+        else:
+            # A merge replaced segments: rebuild the id map
+            loaded = {s.name: s for s in self.segments}
+            self.segments, self.live = [], {}
+            for name in names:
+                segment = Segment(self.directory, name, self.dim, self.dtype)
+                if name in loaded and name != names[-1]:
+                    segment = loaded[name]  # sealed, unchanged
+                    segment.refresh()
+                    segment.alive[:] = False
+                    self.segments.append(segment)
+                    self._index_rows(segment, 0, segment.rows)
+                    self._assign(segment)
+                else:
+                    self.segments.append(segment)
+                    self._refresh_segment(segment)
+        if manifest.get("ann") != self._ann_version:
+            # New centroids: every row moves to its new list
+            self.ann = IVFIndex.load(self.ann_path, self.dim) if manifest.get("ann") else None
+            self._ann_version = manifest.get("ann")
+            for segment in self.segments:
+                segment.lists = np.zeros(0, dtype=np.int32)
+                self._assign(segment)
+        self._manifest_text = text
+
+    def _index_rows(self, segment, start, end):
+        for row in range(start, end):
+            key = segment.ids[row]
+            previous = self.live.pop(key, None)
+            if previous:
+                previous[0].alive[previous[1]] = False
+            if segment.texts[row] is not None:
+                self.live[key] = (segment, row)
+                segment.alive[row] = True
+
+    def __len__(self):
+        self.refresh()
+        return len(self.live)
+
+    def search(self, query_vector, top_k=3, nprobe=None, exact=False):
+        """
+        Top k (text, cosine similarity) pairs, best first. Goes through the
+        IVF index when there is one, unless exact=True (brute force).
+        """
+        self.refresh()
+        with self._lock:
+            if not self.live or top_k <= 0:
+                return []
+            query = np.asarray(query_vector, dtype=np.float32)
+            if query.shape != (self.dim,):
+                return []
+            query = query / max(np.linalg.norm(query), 1e-8)
+            probe = None if exact or self.ann is None else self.ann.probe(query, nprobe)
+            candidates = []
+            for segment in self.segments:
+                candidates.extend(segment.top(query, top_k, probe))
+        candidates.sort(key=lambda c: -c[0])
+        return [(text, score) for score, text in candidates[:top_k]]
+
+    def stats(self):
+        self.refresh()
+        with self._lock:
+            rows = sum(s.rows for s in self.segments)
+            return {
+                "segments": len(self.segments),
+                "rows": rows,
+                "live": len(self.live),
+                "dead": rows - len(self.live),
+                "dtype": self.dtype,
+                "dim": self.dim,
+                "ann_lists": self.ann.nlist if self.ann else 0,
+            }
+
+    # --- writing ---
+
+    def put_many(self, records):
+        """Appends (id, text, vector) records; a later record for an id replaces it."""
+        records = [(key, text, np.asarray(vector, dtype=np.float32)) for key, text, vector in records]
+        if records:
+            self._append([(key, text, vector / max(np.linalg.norm(vector), 1e-8)) for key, text, vector in records])
+
+    def put(self, key, text, vector):
+        self.put_many([(key, text, vector)])
+
+    def delete(self, keys):
+        """Writes tombstones; the rows disappear from searches at once and from disk on merge."""
+        self.refresh()
+        if self.dim is None:
+            return
+        zeros = np.zeros(self.dim, dtype=np.float32)
+        self._append([(key, None, zeros) for key in keys])
+
+    def _append(self, records):
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if manifest["dim"] is None:
+                manifest["dim"] = int(records[0][2].shape[0])
+                manifest["dtype"] = self.dtype
+            dim, dtype = manifest["dim"], manifest["dtype"]
+            sealed = False
+            while records:
+                if not manifest["segments"] or self._active_rows(manifest, dim, dtype) >= self.segment_rows:
+                    name = f"seg-{manifest['next']:06d}"
+                    manifest["next"] += 1
+                    manifest["segments"].append(name)
+                    open(os.path.join(self.directory, f"{name}.vec"), "wb").close()
+                    open(os.path.join(self.directory, f"{name}.jsonl"), "wb").close()
+                    self._write_manifest(manifest)
+                    sealed = len(manifest["segments"]) > 1
+                room = self.segment_rows - self._active_rows(manifest, dim, dtype)
+                batch, records = records[:room], records[room:]
+                self._write_rows(manifest["segments"][-1], batch, dim, dtype)
+            merge_due = sealed and len(manifest["segments"]) - 1 > self.max_sealed
+        self.refresh()
+        if merge_due or self._ann_due():
+            self.maintain_async()
+
+    def _active_rows(self, manifest, dim, dtype):
+        path = os.path.join(self.directory, f"{manifest['segments'][-1]}.vec")
+        return os.path.getsize(path) // (dim * np.dtype(dtype).itemsize)
+
+    def _write_rows(self, name, records, dim, dtype):
+        vectors = np.vstack([vector for _, _, vector in records]).astype(dtype)
+        if vectors.shape[1] != dim:
+            raise ValueError(f"vector dimension {vectors.shape[1]} != store dimension {dim}")
+        lines = "".join(
+            json.dumps({"id": key, "deleted": True} if text is None else {"id": key, "text": text}, ensure_ascii=False) + "\n"
+            for key, text, _ in records
+        )
+        with open(os.path.join(self.directory, f"{name}.vec"), "ab") as f:
+            f.write(vectors.tobytes())
+        with open(os.path.join(self.directory, f"{name}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    # --- background maintenance: merging, IVF training ---
+
+    def maintain_async(self):
+        with self._lock:
+            if self._maintaining:
+                return
+            self._maintaining = True
+        threading.Thread(target=self._maintain, name="genie-segment-maintenance", daemon=True).start()
+
+    def _maintain(self):
+        try:
+            if len(self.segments) - 1 > self.max_sealed:
+                self.merge()
+            if self._ann_due():
+                self.build_ann()
+        except Exception as e:
+            print(f"[SEGMENTS] Maintenance failed: {e}")
+        finally:
+            with self._lock:
+                self._maintaining = False
+
+    def _ann_due(self):
+        live = len(self.live)
+        return live >= self.ann_min_rows and (self.ann is None or self.ann.stale(live))
+
+    def build_ann(self, nlist=None):
+        """Trains IVF centroids on (a sample of) the live rows and publishes them to every reader."""
+        self.refresh()
+        rng = np.random.default_rng(0)
+        with self._lock:
+            live = len(self.live)
+            if not live:
+                return False
+            keep = min(1.0, TRAIN_SAMPLE / live)
+            parts = []
+            for segment in self.segments:
+                rows = np.flatnonzero(segment.alive)
+                if keep < 1.0:
+                    rows = rows[rng.random(len(rows)) < keep]
+                parts.append(np.asarray(segment.matrix[rows], dtype=np.float32))
+        ann = IVFIndex.train(np.vstack(parts), nlist, rows=live)
+        with self._file_lock():
+            ann.save(self.ann_path)
+            manifest = self._read_manifest()
+            manifest["ann"] = manifest.get("ann", 0) + 1
+            self._write_manifest(manifest)
+        self.refresh()
+        print(f"[SEGMENTS] Trained {ann.nlist} IVF lists on {live} rows")
+        return True
+
+    # --- merging ---
+
+    def merge(self):
+        """
+        Rewrites all sealed segments as one, without dead rows or tombstones.
+        Sealed segments never change, so the copy runs without the lock;
+        writes keep going to the active segment meanwhile.
+        """
+        with self._file_lock():
+            self.refresh()
+            manifest = self._read_manifest()
+            sealed = manifest["segments"][:-1]
+            if len(sealed) < 2:
+                return False
+            name = f"seg-{manifest['next']:06d}"
+            manifest["next"] += 1
+            self._write_manifest(manifest)
+
+        with self._lock:
+            by_name = {s.name: s for s in self.segments}
+            parts = [(by_name[n], np.flatnonzero(by_name[n].alive)) for n in sealed]
+        ids = [s.ids[i] for s, rows in parts for i in rows]
+        texts = [s.texts[i] for s, rows in parts for i in rows]
+        dim, dtype = manifest["dim"], manifest["dtype"]
+        vectors = np.vstack([np.asarray(s.matrix[rows]) for s, rows in parts]) if ids else np.zeros((0, dim), dtype=dtype)
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.vec.tmp", "wb") as f:
+            f.write(vectors.astype(dtype).tobytes())
+        with open(f"{path}.jsonl.tmp", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"id": k, "text": t}, ensure_ascii=False) + "\n" for k, t in zip(ids, texts))
+        os.replace(f"{path}.vec.tmp", f"{path}.vec")
+        os.replace(f"{path}.jsonl.tmp", f"{path}.jsonl")
+
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if manifest["segments"][:len(sealed)] != sealed:
+                raise RuntimeError("segments changed during merge")
+            manifest["segments"] = [name] + manifest["segments"][len(sealed):]
+            self._write_manifest(manifest)
+            for old in sealed:
+                # Processes that still map these keep their pages until they refresh
+                for ext in (".vec", ".jsonl"):
+                    os.remove(os.path.join(self.directory, old + ext))
+        self.refresh()
+        print(f"[SEGMENTS] Merged {len(sealed)} segments into {name} ({len(ids)} live rows)")
+        return True
+
+if __name__ == "__main__":
+    store = SegmentStore()
+    if sys.argv[1:] == ["merge"]:
+        store.merge()
+    elif sys.argv[1:] == ["ann"]:
+        store.build_ann()
+    print(json.dumps(store.stats()))
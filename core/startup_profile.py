@@ -0,0 +1,86 @@
+"""
+Startup profiler for `python master.py --profile-startup`.
+
+Times every first-time import (inclusive and self time, per thread) and the
+named init stages master.py wraps in profiler.stage(...), then prints both
+tables. Stdlib only, so it can be installed before anything heavy loads.
+"""
+import sys
+import time
+import builtins
+import threading
+from contextlib import contextmanager
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.imports = {}  # module -> (inclusive s, self s)
+        self.stages = []   # (name, seconds)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        original = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            stack = self._stack()
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.imports.setdefault(name, (elapsed, elapsed - nested))
+
+        builtins.__import__ = timed_import
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name):
+        """Times an init step (no-op unless installed)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages.append((name, time.perf_counter() - start))
+
+    def report(self, top=20):
+        with self._lock:
+            imports = dict(self.imports)
+            stages = list(self.stages)
+
+        packages = {}
+        for name, (_, own) in imports.items():
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0.0) + own
+
+        print(f"\n=== Startup profile ({time.perf_counter() - self.started:.2f}s since launch) ===")
+        print(f"{'package (self time of all its imports)':<44}{'ms':>10}")
+        for root, own in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+            print(f"{root:<44}{own * 1000:>10.1f}")
+        print(f"\n{'import (inclusive)':<44}{'ms':>10}")
+        for name, (inclusive, _) in sorted(imports.items(), key=lambda kv: -kv[1][0])[:top]:
+            print(f"{name:<44}{inclusive * 1000:>10.1f}")
+        print(f"\n{'init stage':<44}{'ms':>10}")
+        for name, seconds in stages:
+            print(f"{name:<44}{seconds * 1000:>10.1f}")
+
+profiler = StartupProfiler()
@@ -0,0 +1,53 @@
+import re
+from collections import namedtuple
+
+DIRECTIVE_RE = re.compile(r"EXECUTE_AGENT:\s+([a-zA-Z0-9_-]+)(.*)")
+# "EXECUTE_AGENT:" at the end of a line: the agent name follows on the next one
+DANGLING_RE = re.compile(r"EXECUTE_AGENT:\s*$")
+
+AgentDirective = namedtuple("AgentDirective", ["name", "args"])
+
+class DirectiveStreamParser:
+    """
+    Incrementally scans a streamed model response for EXECUTE_AGENT lines.
+
+    feed() returns every directive whose line has been completed by the new
+    chunk, so an agent can start while the rest of the response is still
+    arriving; close() flushes the final, unterminated line.
+    """
+
+    def __init__(self):
+        self._line = ""
+
+    def feed(self, chunk):
+        self._line += chunk
+        if "\n" not in chunk:
+            return []
+
+        *lines, self._line = self._line.split("\n")
+        directives = []
+        carry = ""
+        for line in lines:
+            line = carry + line
+            carry = ""
+            if DANGLING_RE.search(line):
+                carry = line + " "
+                continue
+            directive = self._parse(line)
+            if directive:
+                directives.append(directive)
+        if carry:
+            self._line = carry + self._line
+        return directives
+
+    def close(self):
+        line, self._line = self._line, ""
+        directive = self._parse(line)
+        return [directive] if directive else []
+
+    @staticmethod
+    def _parse(line):
+        match = DIRECTIVE_RE.search(line)
+        if not match:
+            return None
+        return AgentDirective(match.group(1), match.group(2).strip())
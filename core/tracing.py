@@ -0,0 +1,165 @@
+"""
+Lightweight per-request tracing.
+
+Spans carry the request_id / chat_id of the request they belong to and are
+written to a JSONL file or a Redis stream, depending on GENIE_TRACE:
+
+    GENIE_TRACE=off    (default) spans are dropped
+    GENIE_TRACE=file   appended to GENIE_TRACE_FILE (logs/traces/spans.jsonl)
+    GENIE_TRACE=redis  XADD to genie:trace:spans
+
+Report p50/p95/p99 per stage with:
+
+    python -m core.tracing [--source file|redis] [--file PATH] [--last N]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
+TRACE_STREAM = "genie:trace:spans"
+DEFAULT_TRACE_FILE = os.path.join("logs", "traces", "spans.jsonl")
+
+_request = contextvars.ContextVar("genie_trace_request", default=None)
+
+class Tracer:
+    def __init__(self, mode=None, path=None):
+        self.mode = (mode or os.getenv("GENIE_TRACE", "off")).lower()
+        self.path = path or os.getenv("GENIE_TRACE_FILE", DEFAULT_TRACE_FILE)
+        self._lock = threading.Lock()
+        self._redis = None
+
+    @property
+    def enabled(self):
+        return self.mode in ("file", "redis")
+
+    def emit(self, record):
+        try:
+            if self.mode == "file":
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                with self._lock:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a") as f:
+                        f.write(line)
+            elif self.mode == "redis":
+                if self._redis is None:
+                    import redis
+                    self._redis = redis.from_url(REDIS_URL, decode_responses=True)
+                self._redis.xadd(TRACE_STREAM, {"span": json.dumps(record, ensure_ascii=False)}, maxlen=50000, approximate=True)
+        except Exception as e:
+            print(f"[TRACE] Failed to record span: {e}")
+
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+@contextmanager
+def request_scope(request_id=None, chat_id=None):
+    """Binds request_id/chat_id to every span recorded inside the block."""
+    token = _request.set({"request_id": request_id or new_request_id(), "chat_id": chat_id})
+    try:
+        yield _request.get()
+    finally:
+        _request.reset(token)
+
+def current_request():
+    return _request.get() or {}
+
+def record_span(name, duration, start=None, **attrs):
+    """Records an already-measured span (seconds)."""
+    if not _tracer.enabled:
+        return
+    record = {
+        "name": name,
+        "start": round(start if start is not None else time.time() - duration, 6),
+        "duration_ms": round(duration * 1000, 3),
+        **current_request(),
+        **attrs,
+    }
+    _tracer.emit(record)
+
+@contextmanager
+def span(name, **attrs):
+    """Times the enclosed block as one stage of the current request."""
+    if not _tracer.enabled:
+        yield attrs
+        return
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record_span(name, time.perf_counter() - t0, start=start, **attrs)
+
+def load_spans(source="file", path=None, last=None):
+    if source == "redis":
+        import redis
+        r = redis.from_url(REDIS_URL, decode_responses=True)
+        entries = r.xrevrange(TRACE_STREAM, count=last) if last else r.xrange(TRACE_STREAM)
+        return [json.loads(fields["span"]) for _, fields in entries]
+
+    spans = []
+    with open(path or _tracer.path, "r") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans[-last:] if last else spans
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+def summarize(spans):
+    """Returns {stage: {count, p50, p95, p99, max}} in milliseconds."""
+    by_stage = {}
+    for s in spans:
+        by_stage.setdefault(s["name"], []).append(s["duration_ms"])
+    summary = {}
+    for name, values in by_stage.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Genie per-stage latency report")
+    parser.add_argument("--source", choices=["file", "redis"], default="file")
+    parser.add_argument("--file", help=f"JSONL span file (default {DEFAULT_TRACE_FILE})")
+    parser.add_argument("--last", type=int, help="Only the last N spans")
+    args = parser.parse_args()
+
+    try:
+        spans = load_spans(args.source, args.file, args.last)
+    except FileNotFoundError as e:
+        print(f"No trace file: {e.filename}. Run the master with GENIE_TRACE=file first.")
+        sys.exit(1)
+
+    summary = summarize(spans)
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'max ms':>12}")
+    for name, row in sorted(summary.items(), key=lambda kv: -kv[1]["p50"]):
+        print(f"{name:<24}{row['count']:>8}{row['p50']:>12.1f}{row['p95']:>12.1f}{row['p99']:>12.1f}{row['max']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 import os
 import json
+import time
 import logging
 import numpy as np
-from redisvl.index import SearchIndex
-from redisvl.query import VectorQuery
-from sentence_transformers import SentenceTransformer
+from core.embeddings import get_embedder, embed_query, encode_batches, report_ingest
+from core.memory_index import MemoryIndex
 
 # Suppress noisy startup warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -15,9 +15,13 @@ class GenieVectorEngine:
     """
     INDEX_NAME = "genie_memory"
     
-    def __init__(self, redis_url="redis://localhost:6379/1"):
-        self.redis_url = redis_url
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, redis_url=None):
+        # redisvl is slow to import; only pay for it when the engine is built
+        from redisvl.index import SearchIndex
+
+        # Read here, not at import: master.py loads .env after its imports
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/1")
+        self.model = get_embedder()
         
         # Define Schema
         self.schema = {
@@ -34,7 +38,7 @@ class GenieVectorEngine:
         }
         
         self.index = SearchIndex.from_dict(self.schema)
-        self.index.connect(redis_url)
+        self.index.connect(self.redis_url)
         
         self.enabled_vsearch = True
         try:
@@ -44,25 +48,44 @@ class GenieVectorEngine:
         except Exception:
             print(f"[*] RedisVL Search not supported. Using Manual Fallback.")
             self.enabled_vsearch = False
+        # Fallback: every memory vector held in RAM, loaded on first search
+        self.memory_index = None if self.enabled_vsearch else MemoryIndex(self.index._redis_client, encoder=self.model)
 
     def ingest(self, text, source="manual"):
-        vector = self.model.encode(text).astype(np.float32).tolist()
-        if self.enabled_vsearch:
-            self.index.load([{"text": text, "source": source, "vector": vector}])
-        else:
-            import uuid
-            key = f"genie:mem:{uuid.uuid4().hex}"
+        self.ingest_many([text], [source], report=False)
+
+    def ingest_many(self, texts, sources=None, batch_size=None, report=True):
+        """
+        Encodes texts GENIE_INGEST_BATCH at a time and writes each batch with
+        one bulk index.load (or one Redis pipeline in the fallback).
+        """
+        import uuid
+        texts = list(texts)
+        sources = list(sources) if sources is not None else ["manual"] * len(texts)
+        started = time.time()
+        for start, vectors in encode_batches(self.model, texts, batch_size):
+            batch = list(zip(texts[start:start + len(vectors)], sources[start:start + len(vectors)], vectors))
+            if self.enabled_vsearch:
+                self.index.load([{"text": text, "source": source, "vector": vector.tolist()} for text, source, vector in batch])
+                continue
             # Use raw redis client for manual storage
-            self.index._redis_client.hset(key, mapping={
-                "text": text,
-                "source": source,
-                "vector": np.array(vector, dtype=np.float32).tobytes()
-            })
+            pipe = self.index._redis_client.pipeline(transaction=False)
+            keys = [f"genie:mem:{uuid.uuid4().hex}" for _ in batch]
+            for key, (text, source, vector) in zip(keys, batch):
+                pipe.hset(key, mapping={"text": text, "source": source, "vector": vector.tobytes()})
+            pipe.execute()
+            for key, (text, _, vector) in zip(keys, batch):
+                self.memory_index.add(key, text, vector)
+            self.memory_index.written()
+        if report:
+            report_ingest(len(texts), started)
+        return len(texts)
 
     def search(self, query, top_k=3):
-        query_vector = self.model.encode(query).astype(np.float32)
+        query_vector = embed_query(query).astype(np.float32)
         
         if self.enabled_vsearch:
+            from redisvl.query import VectorQuery
             v_query = VectorQuery(
                 vector=query_vector.tolist(),
                 vector_field_name="vector",
@@ -71,25 +94,5 @@ class GenieVectorEngine:
             )
             return [res['text'] for res in self.index.query(v_query)]
         else:
-            r = self.index._redis_client
-            # IMPORTANT: Search both bytes and string keys for maximum compatibility
-            keys = r.keys("genie:mem:*")
-            scored_results = []
-            for key in keys:
-                data = r.hgetall(key)
-                # Normalize data keys (handle both bytes and strings)
-                norm_data = {k.decode('utf-8') if isinstance(k, bytes) else k: v for k, v in data.items()}
-                
-                if "text" in norm_data and "vector" in norm_data:
-                    text_val = norm_data["text"]
-                    if isinstance(text_val, bytes): text_val = text_val.decode('utf-8')
-                    
-                    vec_val = norm_data["vector"]
-                    stored_vector = np.frombuffer(vec_val, dtype=np.float32)
-                    
-                    if stored_vector.shape == query_vector.shape:
-                        similarity = np.dot(query_vector, stored_vector) / (np.linalg.norm(query_vector) * np.linalg.norm(stored_vector))
-                        scored_results.append((text_val, similarity))
-            
-            scored_results.sort(key=lambda x: x[1], reverse=True)
-            return [res[0] for res in scored_results[:top_k]]
+            self.memory_index.refresh()
+            return [text for text, _ in self.memory_index.search(query_vector, top_k)]
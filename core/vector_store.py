@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 import warnings
 
@@ -9,49 +10,76 @@ logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
 logging.getLogger("transformers").setLevel(logging.ERROR)
 
 import redis
-import numpy as np
-from sentence_transformers import SentenceTransformer
+from core.embeddings import get_embedder, embed_query, encode_batches, report_ingest
+from core.memory_index import MemoryIndex
 import json
 
+# redis: vectors in genie:mem:* hashes | segments: local mmap files (core/segment_store.py)
+VECTOR_BACKEND = os.getenv("GENIE_VECTOR_BACKEND", "redis")
+
 class VectorStore:
-    def __init__(self, host='localhost', port=6379, db=1, prefix='genie:mem:'):
+    def __init__(self, host='localhost', port=6379, db=1, prefix='genie:mem:', backend=None):
         self.prefix = prefix
+        self.backend = backend or VECTOR_BACKEND
         self.redis_client = redis.Redis(host=host, port=port, db=db)
-        # Initialize model silently
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Shared process-wide model
+        self.model = get_embedder()
+        if self.backend == "segments":
+            from core.segment_store import SegmentStore
+            self.segments = SegmentStore()
+        else:
+            self.memory_index = MemoryIndex(self.redis_client, prefix, encoder=self.model)
         print("Memory Core Loaded.")
 
+    def location(self):
+        """Where this store keeps its vectors, for reports."""
+        if self.backend == "segments":
+            return f"segment files in {self.segments.directory}"
+        conn = self.redis_client.connection_pool.connection_kwargs
+        return f"Redis DB {conn.get('db', 0)} at {conn.get('host')}:{conn.get('port')}"
+
     def ingest(self, text, source_id):
-        vector = self.model.encode(text)
-        vector_bytes = vector.tobytes()
-        
+        self.ingest_many([text], [source_id], report=False)
+
+    def ingest_many(self, texts, source_ids, batch_size=None, report=True):
+        """
+        Encodes texts GENIE_INGEST_BATCH at a time; each batch is one Redis
+        pipeline (or one segment append).
+        """
+        texts, source_ids = list(texts), list(source_ids)
+        started = time.time()
+        for start, vectors in encode_batches(self.model, texts, batch_size):
+            keys = [f"{self.prefix}{source_id}" for source_id in source_ids[start:start + len(vectors)]]
+            batch = list(zip(keys, texts[start:start + len(vectors)], vectors))
+            if self.backend == "segments":
+                self.segments.put_many(batch)
+                continue
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, text, vector in batch:
+                pipe.hset(key, mapping={"text": text, "vector": vector.tobytes()})
+            pipe.execute()
+            for key, text, vector in batch:
+                self.memory_index.add(key, text, vector)
+            self.memory_index.written()
+        if report:
+            report_ingest(len(texts), started)
+        return len(texts)
+
+    def delete(self, source_id):
         key = f"{self.prefix}{source_id}"
-        self.redis_client.hset(key, mapping={
-            "text": text,
-            "vector": vector_bytes
-        })
+        if self.backend == "segments":
+            self.segments.delete([key])
+        else:
+            self.redis_client.delete(key)
+            self.memory_index.remove(key)
+            self.memory_index.written()
 
     def search(self, query, top_k=3):
-        query_vector = self.model.encode(query)
-        keys = self.redis_client.keys(f"{self.prefix}*")
-        
-        results = []
-        for key in keys:
-            data = self.redis_client.hgetall(key)
-            if b"text" in data and b"vector" in data:
-                stored_text = data[b"text"].decode('utf-8')
-                stored_vector_bytes = data[b"vector"]
-                stored_vector = np.frombuffer(stored_vector_bytes, dtype=np.float32)
-                
-                norm_q = np.linalg.norm(query_vector)
-                norm_s = np.linalg.norm(stored_vector)
-                
-                if norm_q > 0 and norm_s > 0:
-                    similarity = np.dot(query_vector, stored_vector) / (norm_q * norm_s)
-                    results.append((stored_text, similarity))
-        
-        results.sort(key=lambda x: x[1], reverse=True)
-        return [res[0] for res in results[:top_k]]
+        query_vector = embed_query(query)
+        if self.backend == "segments":
+            return [text for text, _ in self.segments.search(query_vector, top_k)]
+        self.memory_index.refresh()
+        return [text for text, _ in self.memory_index.search(query_vector, top_k)]
 
 if __name__ == "__main__":
     store = VectorStore()
\ No newline at end of file
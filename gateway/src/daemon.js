@@ -22,6 +22,8 @@ async function processLoop() {
             const job = JSON.parse(dataStr);
             
             console.log(`[Daemon] Processing Request: ${job.id}`);
+            // Pickup stamp so the caller can measure queue wait
+            await pubClient.set(`genie:job:${job.id}:picked`, Date.now() / 1000, "EX", 600);
             await runGemini(job);
             
         } catch (error) {
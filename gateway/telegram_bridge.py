@@ -4,7 +4,7 @@ import asyncio
 import logging
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
 import redis.asyncio as redis
 
 # Load environment variables
@@ -16,6 +16,10 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
 REDIS_RESPONSE_KEY = "genie:response:outbox"
 REDIS_USER_INBOX = "genie:user:inbox"
+# Commands the master must see even when the inbox is backed up
+REDIS_CONTROL_KEY = "genie:user:control"
+# Admin chat gets the high lane; everyone else is normal (see core/lanes.py)
+ADMIN_CHAT_ID = os.getenv("TG_USER_ID")
 
 # Setup Logging
 logging.basicConfig(
@@ -23,12 +27,19 @@ logging.basicConfig(
     level=logging.INFO
 )
 
+def inbox_lane(chat_id) -> str:
+    """Picks the inbox priority lane for a chat."""
+    if ADMIN_CHAT_ID and str(chat_id) == ADMIN_CHAT_ID:
+        return "high"
+    return "normal"
+
 async def push_to_redis_inbox(data: dict):
-    """Pushes the message payload directly to Redis."""
+    """Pushes the message payload directly to Redis, on the lane it is tagged with."""
     try:
         r = redis.from_url(REDIS_URL, decode_responses=True)
-        await r.rpush(REDIS_USER_INBOX, json.dumps(data))
-        logging.info(f"Pushed message from {data.get('username', 'unknown')} to Redis")
+        lane = data.get("lane", "normal")
+        await r.rpush(f"{REDIS_USER_INBOX}:{lane}", json.dumps(data))
+        logging.info(f"Pushed message from {data.get('username', 'unknown')} to Redis ({lane} lane)")
     except Exception as e:
         logging.error(f"Failed to push to Redis: {e}")
 
@@ -43,11 +54,31 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "chat_id": update.message.chat_id,
         "username": user.username or user.first_name,
         "text": update.message.text,
-        "timestamp": update.message.date.timestamp()
+        "timestamp": update.message.date.timestamp(),
+        "lane": inbox_lane(update.message.chat_id)
     }
     
     await push_to_redis_inbox(payload)
 
+async def handle_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/cancel: stops the chat's running task and drops its queued messages."""
+    if not update.message:
+        return
+
+    user = update.message.from_user
+    payload = {
+        "platform": "telegram",
+        "chat_id": update.message.chat_id,
+        "username": user.username or user.first_name,
+        "command": "cancel"
+    }
+    try:
+        r = redis.from_url(REDIS_URL, decode_responses=True)
+        await r.rpush(REDIS_CONTROL_KEY, json.dumps(payload))
+        logging.info(f"Cancel requested by {payload['username']}")
+    except Exception as e:
+        logging.error(f"Failed to push cancel to Redis: {e}")
+
 async def poll_redis_responses(app):
     """Polls Redis for outgoing messages from Master."""
     try:
@@ -133,6 +164,7 @@ def main():
 
     app = ApplicationBuilder().token(actual_token).post_init(post_init).build()
     
+    app.add_handler(CommandHandler("cancel", handle_cancel))
     app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message))
     
     print("Telegram Bridge Active. Listening...")
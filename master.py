@@ -1,29 +1,109 @@
 import sys
+from core.startup_profile import profiler
+# Installed before anything else so every import below is timed
+if "--profile-startup" in sys.argv:
+    profiler.install()
 import os
-import re
-import subprocess
 import json
 import time
-import select
+import codecs
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import redis
+import redis.asyncio as aioredis
 from dotenv import load_dotenv
 
 from core.session_manager import SessionManager
 from core.context_builder import ContextBuilder
 from core.ai_wrapper import call_gemini
 from core.router import GenieRouter
+from core.dispatcher import RequestDispatcher, QueueFull
+from core.stream_parser import DirectiveStreamParser
+from core.conversation import ConversationState
+from core.response_cache import SemanticResponseCache
+from core.tracing import request_scope, span
+from core.embeddings import query_scope, embed_query, get_embedder
+from core.lanes import LaneScheduler, lane_of
+from core.agent_runner import get_agent_runner, kill_agent
+from core.agent_limits import AgentLimits
+from core.agent_output import (
+    AgentOutput, event_key, iter_agent_streams, open_event_channel,
+    parse_event_line, parse_legacy_marker,
+)
 
 # Load environment variables
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
 REDIS_RESPONSE_KEY = "genie:response:outbox"
-REDIS_USER_INBOX = "genie:user:inbox"
+REDIS_CACHE_STATS_KEY = "genie:stats:response_cache"
+REDIS_ROUTER_STATS_KEY = "genie:stats:router"
+# Where EXECUTE_AGENT looks up agents (the benchmark points this at stubs)
+AGENTS_DIR = os.getenv("GENIE_AGENTS_DIR", "agents")
 
-def process_request(user_input, source, metadata, session_mgr, ctx_builder, redis_client, router):
+# Agents run here so they can start while the model is still streaming
+AGENT_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="genie-agent")
+# Max agents running at once for a single model turn
+AGENT_CONCURRENCY = max(1, int(os.getenv("GENIE_AGENT_CONCURRENCY", "3")))
+AGENT_LIMITS = AgentLimits()
+
+# /cancel support: the running request of each chat, and the cancel flag
+# of the request the current thread works for (copied into agent threads)
+REDIS_CONTROL_KEY = "genie:user:control"
+ACTIVE_REQUESTS = {}  # request key -> threading.Event
+ACTIVE_LOCK = threading.Lock()
+CANCEL_EVENT = contextvars.ContextVar("genie_cancel_event", default=None)
+# Source ("cli", "telegram", "cron") of the request the current thread works for
+REQUEST_SOURCE = contextvars.ContextVar("genie_request_source", default=None)
+
+# Sources whose answers go back to metadata["chat_id"] on Telegram
+CHAT_SOURCES = ("telegram", "cron")
+
+# Set once warm_up() has loaded the embedding model and vector engine
+MODELS_WARM = threading.Event()
+
+def process_request(user_input, source, metadata, session_mgr, ctx_builder, redis_client, router, response_cache=None):
     """
     Processes a single user request from any source.
     """
+    chat_id = metadata.get("chat_id") if source in CHAT_SOURCES else None
+    key = request_key(source, metadata)
+    cancel = threading.Event()
+    with ACTIVE_LOCK:
+        ACTIVE_REQUESTS[key] = cancel
+    token = CANCEL_EVENT.set(cancel)
+    source_token = REQUEST_SOURCE.set(source)
+    try:
+        with request_scope(chat_id=chat_id), span("request", source=source), query_scope(user_input):
+            run_request(user_input, source, metadata, session_mgr, ctx_builder, redis_client, router, response_cache)
+    finally:
+        REQUEST_SOURCE.reset(source_token)
+        CANCEL_EVENT.reset(token)
+        with ACTIVE_LOCK:
+            if ACTIVE_REQUESTS.get(key) is cancel:
+                del ACTIVE_REQUESTS[key]
+
+def is_cancelled():
+    cancel = CANCEL_EVENT.get()
+    return cancel is not None and cancel.is_set()
+
+def cancel_request(dispatcher, key):
+    """Cancels the running request of a chat and drops its queued ones. Returns a notice."""
+    dropped = dispatcher.drop_pending(key)
+    with ACTIVE_LOCK:
+        cancel = ACTIVE_REQUESTS.get(key)
+    if cancel:
+        cancel.set()
+    if not cancel and not dropped:
+        return "Nothing to cancel."
+    notice = "🛑 Cancelling the current task, partial results will follow." if cancel else "🛑 Cancelled."
+    if dropped:
+        notice += f" Dropped {dropped} queued request(s)."
+    return notice
+
+def run_request(user_input, source, metadata, session_mgr, ctx_builder, redis_client, router, response_cache):
     # Identify User for Context
     user_id = "cli_user"
     if source == "telegram":
@@ -32,15 +112,34 @@ def process_request(user_input, source, metadata, session_mgr, ctx_builder, redi
 
     try:
         # 1. Semantic Intent Pre-routing
-        detected_route = router.guide(user_input)
+        with span("router.guide") as trace:
+            detected_route, trace["layer"] = router.classify(user_input)
+            trace["route"] = detected_route
+        report_router_stats(router, redis_client)
         if detected_route:
             print(f"[*] Router: Detected intent -> {detected_route}")
 
         intent = session_mgr.detect_intent(user_input)
-        context = ctx_builder.build_context(user_input, intent=intent)
+        with span("build_context"):
+            context = ctx_builder.build_context(user_input, intent=intent)
         
         route_hint = f"\n[ROUTER HINT]: User intent detected as {detected_route}. Prioritize this action." if detected_route else ""
-        current_prompt = f"{context}{route_hint}\n\n[INSTRUCTION]: Think in English logic but reply in the user's language.\n\nUser Input: {user_input}"
+        conversation = ConversationState(f"{context}{route_hint}\n\n[INSTRUCTION]: Think in English logic but reply in the user's language.\n\nUser Input: {user_input}")
+
+        # Semantic cache: answer near-identical questions without Gemini
+        if response_cache:
+            with span("cache.lookup") as trace:
+                cached = response_cache.lookup(user_input, f"{context}{route_hint}")
+                trace["hit"] = bool(cached)
+            report_cache_stats(response_cache, redis_client)
+            if cached:
+                print(f"[*] Cache hit (similarity {cached['similarity']:.3f}), saved ~{cached['latency']:.1f}s")
+                if source == "cli":
+                    sys.stdout.write(f"GenieBot >> {cached['response']}\n")
+                    sys.stdout.flush()
+                deliver_response(cached["response"], source, metadata, redis_client)
+                return
+        started = time.time()
         
         full_response = ""
         loop_count = 0
@@ -55,69 +154,195 @@ def process_request(user_input, source, metadata, session_mgr, ctx_builder, redi
                 sys.stdout.write("GenieBot >> ")
                 sys.stdout.flush()
 
-            for chunk in call_gemini(current_prompt):
+            chat_id = metadata.get("chat_id") if source in CHAT_SOURCES else None
+            parser = DirectiveStreamParser()
+            batch = AgentBatch(redis_client, chat_id, loop_count)
+
+            for chunk in call_gemini(conversation.render()):
                 full_response += chunk
                 if source == "cli":
                     sys.stdout.write(chunk)
                     sys.stdout.flush()
+
+                # Early dispatch: start agents as soon as their line is complete
+                for directive in parser.feed(chunk):
+                    batch.start(directive)
             
             if source == "cli": sys.stdout.write("\n")
 
             # 2. Check for Agent Execution
-            agent_match = re.search(r"EXECUTE_AGENT:\s+([a-zA-Z0-9_-]+)(.*)", full_response)
-            if not agent_match:
-                # 1. ALWAYS check for image tags in the text, even if no agent was called
-                if "IMAGE_GENERATED:" in full_response:
-                    raw_path = full_response.split("IMAGE_GENERATED:")[1].split("\n")[0].strip()
-                    # Resolve to absolute path if needed
-                    img_path = os.path.abspath(raw_path) if not os.path.isabs(raw_path) else raw_path
-                    
-                    if source == "telegram" and os.path.exists(img_path):
-                        print(f"[*] Detected Image in text: {img_path}")
-                        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                            "chat_id": metadata.get("chat_id"),
-                            "type": "photo",
-                            "path": img_path,
-                            "caption": full_response.split("IMAGE_GENERATED:")[0].strip()[:1000]
-                        }))
-                        break # Done with this request
-
-                # 2. Regular text response
-                if source == "telegram":
-                    redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                        "chat_id": metadata.get("chat_id"),
-                        "text": full_response.strip()
-                    }))
+            for directive in parser.close():
+                batch.start(directive)
+
+            if not batch:
+                if is_cancelled():
+                    # Directives were declined, so this is not an answer; /cancel already replied
+                    break
+                deliver_response(full_response, source, metadata, redis_client)
+                # Only side-effect-free, single-turn answers are cacheable
+                if response_cache and loop_count == 1 and is_cacheable(full_response):
+                    response_cache.store(user_input, f"{context}{route_hint}", full_response, time.time() - started)
                 break
 
-            # 3. Execute Agent (Now with streaming feedback)
-            agent_name = agent_match.group(1)
-            agent_args = agent_match.group(2).strip()
-            print(f"[SYSTEM] Loop {loop_count}: Executing {agent_name} {agent_args}")
-            
-            chat_id = metadata.get("chat_id") if source == "telegram" else None
-            agent_output = execute_agent(agent_name, agent_args, redis_client=redis_client, chat_id=chat_id)
-            
+            # 3. Collect Agent Output (started while the response was streaming)
             # 4. Agent Chaining (No need for manual redis push for images/summaries here as they are handled in execute_agent)
 
-            # 5. Feed Output Back to AI for Chaining
-            # Truncate agent output if it's too large for the context
-            safe_output = agent_output
-            if len(safe_output) > 5000:
-                safe_output = safe_output[:5000] + "\n... (truncated for brevity) ..."
-
-            current_prompt = f"{current_prompt}\n\n[AI PREVIOUS RESPONSE]: {full_response}\n\n[AGENT OUTPUT]: {safe_output}\n\n[INSTRUCTION]: Process the agent output and continue if needed. If task complete, provide final summary."
+            # 5. Feed Output Back to AI for Chaining, in directive order
+            # (ConversationState keeps the prompt within its token budget)
+            conversation.add_turn(full_response, batch.merged_output())
 
     except Exception as e:
         print(f"System Error in processing: {str(e)}")
-        if source == "telegram":
+        if source in CHAT_SOURCES:
              redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
                 "chat_id": metadata.get("chat_id"),
                 "text": f"System Error: {str(e)}"
             }))
 
+def deliver_response(full_response, source, metadata, redis_client):
+    """Sends a final answer back to Telegram (CLI output is already streamed)."""
+    # 1. ALWAYS check for image tags in the text, even if no agent was called
+    if "IMAGE_GENERATED:" in full_response:
+        raw_path = full_response.split("IMAGE_GENERATED:")[1].split("\n")[0].strip()
+        # Resolve to absolute path if needed
+        img_path = os.path.abspath(raw_path) if not os.path.isabs(raw_path) else raw_path
+        
+        if source in CHAT_SOURCES and os.path.exists(img_path):
+            print(f"[*] Detected Image in text: {img_path}")
+            redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
+                "chat_id": metadata.get("chat_id"),
+                "type": "photo",
+                "path": img_path,
+                "caption": full_response.split("IMAGE_GENERATED:")[0].strip()[:1000]
+            }))
+            return # Done with this request
+
+    # 2. Regular text response
+    if source in CHAT_SOURCES:
+        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
+            "chat_id": metadata.get("chat_id"),
+            "text": full_response.strip()
+        }))
+
+def is_cacheable(full_response):
+    """Errors, timeouts, cancelled runs, agent directives and image replies are never cached."""
+    if not full_response.strip():
+        return False
+    markers = (
+        "[Error]", "[System Error]", "[SYSTEM ERROR]", "[API ERROR]", "[TIMEOUT]", "[CANCELLED]",
+        "EXECUTE_AGENT:", "IMAGE_GENERATED:",
+    )
+    return not any(m in full_response for m in markers)
+
+def report_cache_stats(response_cache, redis_client):
+    """Publishes hit rate and saved latency to genie:stats:response_cache."""
+    if not redis_client:
+        return
+    try:
+        redis_client.hset(REDIS_CACHE_STATS_KEY, mapping=response_cache.stats())
+    except Exception:
+        pass
+
+def report_router_stats(router, redis_client):
+    """Publishes per-layer router hit rates to genie:stats:router."""
+    if not redis_client:
+        return
+    try:
+        redis_client.hset(REDIS_ROUTER_STATS_KEY, mapping=router.stats())
+    except Exception:
+        pass
+
+class AgentBatch:
+    """
+    All EXECUTE_AGENT directives of one model turn. Each directive starts in
+    the background as soon as it is seen, at most AGENT_CONCURRENCY at a
+    time; outputs are merged in the order the directives appeared.
+    """
+
+    def __init__(self, redis_client, chat_id, loop_count):
+        self.redis_client = redis_client
+        self.chat_id = chat_id
+        self.loop_count = loop_count
+        self.runs = []  # (directive, future) in directive order
+        self._slots = threading.BoundedSemaphore(AGENT_CONCURRENCY)
+
+    def __bool__(self):
+        return bool(self.runs)
+
+    def start(self, directive):
+        if is_cancelled():
+            print(f"[SYSTEM] Loop {self.loop_count}: Request cancelled, not starting {directive.name}")
+            return
+        if any(d == directive for d, _ in self.runs):
+            print(f"[SYSTEM] Loop {self.loop_count}: Skipping duplicate {directive.name} {directive.args}")
+            return
+        print(f"[SYSTEM] Loop {self.loop_count}: Executing {directive.name} {directive.args}")
+        # Carry the request's trace context into the pool thread
+        context = contextvars.copy_context()
+        self.runs.append((directive, AGENT_POOL.submit(context.run, self._run, directive)))
+
+    def _run(self, directive):
+        with self._slots, span("agent", agent=directive.name):
+            return execute_agent(directive.name, directive.args, redis_client=self.redis_client, chat_id=self.chat_id)
+
+    def merged_output(self):
+        """Waits for every agent and returns the combined, truncated output."""
+        outputs = [(d, truncate_agent_output(f.result())) for d, f in self.runs]
+        if len(outputs) == 1:
+            return outputs[0][1]
+        blocks = []
+        for i, (directive, output) in enumerate(outputs, 1):
+            header = f"--- [{i}] {directive.name} {directive.args}".rstrip()
+            blocks.append(f"{header} ---\n{output}")
+        return "\n\n".join(blocks)
+
+class Terminal:
+    """
+    Decides who reads the master's stdin. The CLI reader of run_master owns
+    it, except while an agent of a CLI request runs: that agent gets the
+    terminal (e.g. for an input() prompt) and the reader pauses, as when
+    requests ran on the input loop itself. One agent at a time; all other
+    agents read /dev/null.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reader = None  # (fd, pause, resume), set by watch_stdin
+        self._claimed = False
+
+    def attach(self, fd, pause, resume):
+        self._reader = (fd, pause, resume)
+
+    def claim(self):
+        """The stdin fd for an agent about to start, or None for /dev/null."""
+        if REQUEST_SOURCE.get() != "cli" or self._reader is None:
+            return None
+        with self._lock:
+            if self._claimed:
+                return None
+            self._claimed = True
+        fd, pause, _ = self._reader
+        pause()
+        return fd
+
+    def release(self, fd):
+        """Hands the terminal back to the CLI reader after claim() returned fd."""
+        if fd is None:
+            return
+        self._reader[2]()
+        with self._lock:
+            self._claimed = False
+
+TERMINAL = Terminal()
+
+def truncate_agent_output(output, limit=5000):
+    """Truncate agent output if it's too large for the context."""
+    if len(output) > limit:
+        return output[:limit] + "\n... (truncated for brevity) ..."
+    return output
+
 def execute_agent(name, args, redis_client=None, chat_id=None):
-    agent_root = os.path.join("agents", name)
+    agent_root = os.path.join(AGENTS_DIR, name)
     script_paths = [
         os.path.join(agent_root, "src", "generate.py"),
         os.path.join(agent_root, "src", "main.py")
@@ -158,141 +383,442 @@ def execute_agent(name, args, redis_client=None, chat_id=None):
     # ----------------------------------------
 
     try:
-        # Use Popen for streaming output
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, universal_newlines=True)
-        
-        combined_output = ""
-        start_time = time.time()
-        last_status_time = time.time()
+        # Warm host per venv (falls back to a plain Popen) with streaming output
+        event_r, event_w = open_event_channel()
+        terminal = TERMINAL.claim()
+        try:
+            process = get_agent_runner().spawn(cmd, event_fd=event_w, stdin=terminal)
+        except Exception:
+            TERMINAL.release(terminal)
+            raise
+        finally:
+            os.close(event_w)
+
+        output = AgentOutput()
+        stderr_output = AgentOutput()
+        forwarded = set()
+        limits = AGENT_LIMITS.for_agent(name)
+        started = last_output = last_status_time = time.time()
+        stopped = None
+
+        try:
+            for kind, line in iter_agent_streams(process, event_fd=event_r):
+                if kind == "stdout":
+                    output.append(line)
+                    print(f"[AGENT] {line.strip()}")
+                    last_output = last_status_time = time.time()
+                    # Legacy free-text markers
+                    event = parse_legacy_marker(line)
+                elif kind == "event":
+                    last_output = time.time()
+                    event = parse_event_line(line)
+                elif kind == "stderr":
+                    # Progress logging on stderr counts as activity too
+                    stderr_output.append(line)
+                    last_output = time.time()
+                    event = None
+                else:
+                    event = None
 
-        while True:
-            # Check for output from stdout
-            line = process.stdout.readline()
-            if not line and process.poll() is not None:
-                break
-            
-            if line:
-                combined_output += line
-                print(f"[AGENT] {line.strip()}")
-                
                 # Immediate Telegram Forwarding for Status/Summary
-                if redis_client and chat_id:
-                    if "TELEGRAM_SUMMARY:" in line:
-                        summary = line.split("TELEGRAM_SUMMARY:")[1].strip()
-                        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                            "chat_id": chat_id,
-                            "text": f"🧠 Evolver Insight:\n{summary}"
-                        }))
-                    elif "IMAGE_GENERATED:" in line:
-                        img_path = line.split("IMAGE_GENERATED:")[1].strip()
-                        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                            "chat_id": chat_id,
-                            "type": "photo",
-                            "path": img_path,
-                            "caption": "Image generated successfully."
-                        }))
-                    elif "SUCCESS: Post published to" in line:
-                        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                            "chat_id": chat_id,
-                            "text": f"✅ {line.strip()}"
-                        }))
-                    elif "ERROR: Publication failed" in line:
-                        redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                            "chat_id": chat_id,
-                            "text": f"❌ {line.strip()}"
-                        }))
-
-            # Heartbeat: If no output for 15s and still running
-            if time.time() - last_status_time > 15 and redis_client and chat_id:
-                redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
-                    "chat_id": chat_id,
-                    "text": "⏳ Monitoring task execution..."
-                }))
-                last_status_time = time.time()
-
-        # Capture remaining stderr
-        stderr_output = process.stderr.read()
+                if event and redis_client and chat_id:
+                    key = event_key(event)
+                    if key not in forwarded:
+                        forwarded.add(key)
+                        forward_agent_event(event, redis_client, chat_id)
+
+                # Heartbeat: If no output for 15s and still running
+                if time.time() - last_status_time > 15 and redis_client and chat_id:
+                    redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
+                        "chat_id": chat_id,
+                        "text": "⏳ Monitoring task execution..."
+                    }))
+                    last_status_time = time.time()
+
+                stopped = agent_stop_reason(name, limits, started, last_output)
+                if stopped:
+                    print(f"[SYSTEM] Stopping {name}: {stopped}")
+                    kill_agent(process)
+                    break
+        finally:
+            os.close(event_r)
+            process.stdout.close()
+            process.stderr.close()
+            if process.poll() is None:
+                # Bailed out mid-run: don't leave the agent (or its warm host slot) behind
+                kill_agent(process)
+            TERMINAL.release(terminal)
+
+        if stopped and not is_cancelled() and redis_client and chat_id:
+            redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps({
+                "chat_id": chat_id,
+                "text": f"⏱️ {name} was stopped: {stopped}"
+            }))
+
+        # Report remaining stderr
+        result = output.text().strip()
         if stderr_output:
-            print(f"[AGENT STDERR] ({name}):\n{stderr_output}")
-            if not combined_output:
-                combined_output = f"[ERROR]:\n{stderr_output}"
+            stderr_text = stderr_output.text()
+            print(f"[AGENT STDERR] ({name}):\n{stderr_text}")
+            if not output:
+                result = f"[ERROR]:\n{stderr_text}".strip()
 
-        return combined_output.strip()
+        if stopped:
+            # Partial output still goes back into the chain
+            note = "[CANCELLED]" if is_cancelled() else "[TIMEOUT]"
+            result += f"\n\n{note} {name} was stopped ({stopped}); the output above is partial."
+            if is_cancelled():
+                result += " The user cancelled the task: summarize what was done and do not start new agents."
+        return result.strip()
             
     except Exception as e:
         return f"System Error: Failed to execute agent {name}: {str(e)}"
 
+def agent_stop_reason(name, limits, started, last_output):
+    """Why a running agent must be stopped now, or None."""
+    now = time.time()
+    if is_cancelled():
+        return f"cancelled by the user after {now - started:.0f}s"
+    if limits["timeout"] and now - started > limits["timeout"]:
+        return f"exceeded its {limits['timeout']:.0f}s time limit"
+    if limits["idle_timeout"] and now - last_output > limits["idle_timeout"]:
+        return f"no output for {limits['idle_timeout']:.0f}s"
+    return None
+
+def forward_agent_event(event, redis_client, chat_id):
+    """Pushes an agent event that deserves an immediate Telegram message."""
+    kind = event["event"]
+    if kind == "telegram_summary":
+        message = {"chat_id": chat_id, "text": f"🧠 Evolver Insight:\n{event.get('text', '')}"}
+    elif kind == "image_generated":
+        message = {
+            "chat_id": chat_id,
+            "type": "photo",
+            "path": event.get("path"),
+            "caption": "Image generated successfully."
+        }
+    elif kind == "publish_succeeded":
+        message = {"chat_id": chat_id, "text": f"✅ {event.get('message', '')}"}
+    elif kind == "publish_failed":
+        message = {"chat_id": chat_id, "text": f"❌ {event.get('message', '')}"}
+    else:
+        return
+    redis_client.rpush(REDIS_RESPONSE_KEY, json.dumps(message))
+
+def request_key(source, metadata):
+    """
+    Ordering key: requests with the same key are processed one at a time.
+    Cron jobs are keyed per task, apart from the chat they report to.
+    """
+    if source == "telegram":
+        return f"tg:{metadata.get('chat_id')}"
+    if source == "cron":
+        return f"cron:{metadata.get('task')}"
+    return source
+
+def warm_up(router, ctx_builder):
+    """
+    Loads the embedding model, the router's semantic layer and the vector
+    engine in the background; until MODELS_WARM is set requests are routed
+    by keyword only and answered without RAG or the response cache.
+    """
+    started = time.time()
+    steps = [
+        ("warm.embedding_model", lambda: get_embedder().encode(["warm up"])),
+        ("warm.router", router.warm),
+        ("warm.vector_engine", ctx_builder.warm),
+    ]
+    for name, step in steps:
+        try:
+            with profiler.stage(name):
+                step()
+        except Exception as e:
+            print(f"[!] Warm-up step {name} failed: {e}")
+    MODELS_WARM.set()
+    print(f"[✓] Models warm in {time.time() - started:.1f}s")
+
 def main():
-    session_mgr = SessionManager()
-    ctx_builder = ContextBuilder()
-    router = GenieRouter()
+    with profiler.stage("init.session_manager"):
+        session_mgr = SessionManager()
+    # Heavy parts (model, redisvl) load in warm_up() so input is accepted immediately
+    with profiler.stage("init.context_builder"):
+        ctx_builder = ContextBuilder(lazy=True)
+    with profiler.stage("init.router"):
+        router = GenieRouter(lazy=True)
     
     # Redis Setup
-    try:
-        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-        redis_client.ping()
-    except Exception as e:
-        print(f"Warning: Redis connection failed ({e}). Telegram replies will not work.")
-        redis_client = None
+    with profiler.stage("init.redis"):
+        try:
+            redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+            redis_client.ping()
+        except Exception as e:
+            print(f"Warning: Redis connection failed ({e}). Telegram replies will not work.")
+            redis_client = None
+
+    # Opt-in semantic response cache (GENIE_SEMANTIC_CACHE=1)
+    response_cache = None
+    if os.getenv("GENIE_SEMANTIC_CACHE", "0") == "1":
+        response_cache = SemanticResponseCache(embed_query)
+        print(f"[*] Semantic response cache enabled (threshold {response_cache.threshold})")
+
+    warmer = threading.Thread(target=warm_up, args=(router, ctx_builder), name="genie-warm-up", daemon=True)
+    warmer.start()
+    if profiler.enabled:
+        warmer.join()
+        profiler.report()
+        return
+
+    def handle(user_input, input_source, metadata):
+        # The cache embeds every query; skip it rather than wait for the model
+        cache = response_cache if MODELS_WARM.is_set() else None
+        process_request(user_input, input_source, metadata, session_mgr, ctx_builder, redis_client, router, cache)
+
+        # Restore CLI prompt
+        if input_source == "cli":
+            sys.stdout.write("User >> ")
+            sys.stdout.flush()
+        elif input_source in CHAT_SOURCES:
+            sys.stdout.write("\nUser >> ")
+            sys.stdout.flush()
+
+    # Worker pool: parallel across chats, strictly ordered within a chat
+    dispatcher = RequestDispatcher(handle).start()
 
     print("GenieBot (Bridge-03) Master Engine Active (Semantic Enabled).")
-    print("Modes: [CLI] Interactive | [Telegram] Listening on Redis (genie:user:inbox)")
+    print("Modes: [CLI] Interactive | [Telegram] Listening on Redis (genie:user:inbox:high|normal|bulk)")
+    print(f"Workers: {dispatcher.workers} (set GENIE_MASTER_WORKERS to change), max {dispatcher.max_per_key} pending per chat")
     print("Type 'exit' or 'quit' to stop.")
     
-    while True:
+    try:
+        asyncio.run(run_master(dispatcher, redis_client))
+        # Let in-flight and queued requests finish before leaving
+        dispatcher.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print("\nExiting...")
+        dispatcher.shutdown(wait=False)
+    finally:
+        get_agent_runner().shutdown()
+
+async def run_master(dispatcher, redis_client):
+    """
+    Event-driven input loop: waits on stdin and the Redis inbox at the same
+    time and hands each request to the dispatcher as soon as it arrives.
+    Returns when the CLI user types 'exit' or 'quit'.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    def on_cli_line(line):
+        user_input = line.strip()
+        if not user_input:
+            return
+        if user_input.lower() in ["exit", "quit"]:
+            stop.set()
+            return
+        if user_input.lower() == "/cancel":
+            print(f"[SYSTEM] {cancel_request(dispatcher, request_key('cli', {}))}")
+            return
+        notice = admit_request(dispatcher, user_input, "cli", {})
+        if notice:
+            print(f"[SYSTEM] {notice}")
+
+    watch_stdin(loop, on_cli_line)
+
+    tasks = []
+    if redis_client:
+        tasks.append(asyncio.create_task(consume_inbox(dispatcher)))
+        tasks.append(asyncio.create_task(consume_control(dispatcher)))
+
+    await stop.wait()
+
+    for task in tasks:
+        task.cancel()
         try:
-            input_source = None
-            user_input = None
-            metadata = {}
+            await task
+        except asyncio.CancelledError:
+            pass
 
-            # 1. Check Stdin (Non-blocking)
-            ready_read, _, _ = select.select([sys.stdin], [], [], 0.05)
-            
-            if sys.stdin in ready_read:
-                line = sys.stdin.readline()
-                if line:
-                    user_input = line.strip()
-                    input_source = "cli"
-            
-            # 2. Check Redis Queue (Telegram)
-            if not user_input and redis_client:
-                # Use a small timeout to not block CLI input forever
-                result = redis_client.blpop(REDIS_USER_INBOX, timeout=1)
-                if result:
-                    _, line = result
-                    try:
-                        data = json.loads(line)
-                        user_input = data.get("text")
-                        input_source = "telegram"
-                        metadata = data
-                        print(f"[*] [MASTER] Received from TG ({metadata.get('username')}): {user_input}")
-                    except json.JSONDecodeError:
-                        pass
-
-            # Process if we have input
-            if user_input:
-                if user_input.lower() in ["exit", "quit"] and input_source == "cli":
+def admit_request(dispatcher, user_input, source, metadata):
+    """
+    Hands a request to the dispatcher. Returns a notice for the user when
+    it has to wait behind their earlier requests or is refused, else None.
+    Cron jobs are not subject to the per-chat cap and never notify.
+    """
+    if source == "cron":
+        dispatcher.submit(request_key(source, metadata), user_input, source, metadata, capped=False)
+        return None
+    try:
+        ahead = dispatcher.submit(request_key(source, metadata), user_input, source, metadata)
+    except QueueFull:
+        return f"🚫 You already have {dispatcher.max_per_key} requests in progress. Please wait for them to finish."
+    if ahead:
+        return f"⏳ Queued, position {ahead}. I'll start on it once your earlier requests are done."
+    return None
+
+def watch_stdin(loop, on_line):
+    """
+    Calls on_line(line) on the event loop for every line typed on stdin.
+    Stops watching (but keeps the master running) once stdin hits EOF.
+    TERMINAL pauses the watch while an agent of a CLI request reads stdin.
+    """
+    try:
+        fd = sys.stdin.fileno()
+    except (AttributeError, ValueError, OSError):
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    closed = False
+
+    def on_readable():
+        nonlocal buffer, closed
+        data = os.read(fd, 4096)
+        if not data:
+            closed = True
+            loop.remove_reader(fd)
+            if buffer:
+                on_line(buffer)
+            return
+        buffer += decoder.decode(data)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            on_line(line)
+
+    def on_loop(callback):
+        """Runs callback on the loop and waits for it; called from agent threads."""
+        done = threading.Event()
+
+        def run():
+            try:
+                callback()
+            finally:
+                done.set()
+
+        try:
+            loop.call_soon_threadsafe(run)
+        except RuntimeError:
+            return  # loop closed during shutdown
+        done.wait(5)
+
+    def pause():
+        on_loop(lambda: loop.remove_reader(fd))
+
+    def resume():
+        on_loop(lambda: closed or loop.add_reader(fd, on_readable))
+
+    try:
+        loop.add_reader(fd, on_readable)
+        TERMINAL.attach(fd, pause, resume)
+    except (PermissionError, ValueError, OSError):
+        # stdin is a regular file or otherwise not pollable: read it on a thread
+        def read_lines():
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(on_line, line)
+
+        threading.Thread(target=read_lines, name="genie-stdin", daemon=True).start()
+
+async def consume_inbox(dispatcher):
+    """
+    Pops Telegram/cron messages from the priority lanes and dispatches them.
+
+    A message is only popped once the dispatcher has an idle worker for it,
+    so backlog stays in Redis where the lane order (and LLEN) still applies.
+    """
+    loop = asyncio.get_running_loop()
+    capacity = asyncio.Event()
+
+    def on_request_done():
+        try:
+            loop.call_soon_threadsafe(capacity.set)
+        except RuntimeError:
+            pass  # loop already closed during shutdown
+
+    dispatcher.add_listener(on_request_done)
+    scheduler = LaneScheduler()
+    r = aioredis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        while True:
+            while not dispatcher.has_capacity():
+                capacity.clear()
+                if dispatcher.has_capacity():
                     break
-                
-                process_request(user_input, input_source, metadata, session_mgr, ctx_builder, redis_client, router)
-                
-                # Restore CLI prompt
-                if input_source == "cli":
-                    sys.stdout.write("User >> ")
-                    sys.stdout.flush()
-                elif input_source == "telegram":
-                    sys.stdout.write("\nUser >> ")
-                    sys.stdout.flush()
-            
-            if not user_input:
-                time.sleep(0.1)
+                await capacity.wait()
 
-        except KeyboardInterrupt:
-            print("\nExiting...")
-            break
-        except Exception as e:
-            print(f"System Error: {str(e)}")
-            time.sleep(1)
+            try:
+                result = await r.blpop(scheduler.keys(), timeout=0)
+            except redis.ConnectionError as e:
+                print(f"System Error: {str(e)}")
+                await asyncio.sleep(5)
+                continue
+
+            if not result:
+                continue
+            key, line = result
+            lane = lane_of(key)
+            scheduler.served(lane)
+            try:
+                await handle_inbox_message(r, dispatcher, line, lane)
+            except Exception as e:
+                # One bad payload must not stop intake
+                print(f"System Error in inbox message: {str(e)}")
+    finally:
+        await r.aclose()
+
+def parse_message(line):
+    """The JSON object in a queue entry, or None for anything else."""
+    try:
+        metadata = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return metadata if isinstance(metadata, dict) else None
+
+async def handle_inbox_message(r, dispatcher, line, lane):
+    metadata = parse_message(line)
+    if metadata is None:
+        return
+    user_input = metadata.get("text")
+    if not isinstance(user_input, str) or not user_input:
+        return
+    if metadata.get("platform") == "cron":
+        print(f"[*] [MASTER] Received from cron ({metadata.get('task')}, {lane}): {user_input}")
+        admit_request(dispatcher, user_input, "cron", metadata)
+        return
+    if user_input.strip().lower() == "/cancel":
+        await send_notice(r, metadata, cancel_request(dispatcher, request_key("telegram", metadata)))
+        return
+    print(f"[*] [MASTER] Received from TG ({metadata.get('username')}, {lane}): {user_input}")
+    notice = admit_request(dispatcher, user_input, "telegram", metadata)
+    if notice:
+        await send_notice(r, metadata, notice)
+
+async def consume_control(dispatcher):
+    """
+    Handles Telegram commands such as /cancel. They have their own key so
+    they are seen even while every worker is busy and the lanes are backed up.
+    """
+    r = aioredis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        while True:
+            try:
+                _, line = await r.blpop(REDIS_CONTROL_KEY, timeout=0)
+            except redis.ConnectionError as e:
+                print(f"System Error: {str(e)}")
+                await asyncio.sleep(5)
+                continue
+
+            metadata = parse_message(line)
+            if metadata is None or metadata.get("command") != "cancel":
+                continue
+            try:
+                print(f"[*] [MASTER] Cancel requested by TG ({metadata.get('username')})")
+                await send_notice(r, metadata, cancel_request(dispatcher, request_key("telegram", metadata)))
+            except Exception as e:
+                print(f"System Error in control message: {str(e)}")
+    finally:
+        await r.aclose()
+
+async def send_notice(r, metadata, text):
+    await r.rpush(REDIS_RESPONSE_KEY, json.dumps({"chat_id": metadata.get("chat_id"), "text": text}))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
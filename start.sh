@@ -10,6 +10,11 @@ echo "[0/4] Launching ClawProxy..."
 ./agents/claw_proxy/venv/bin/python3 agents/claw_proxy/src/main.py > agents/claw_proxy/logs/proxy.log 2>&1 &
 PROXY_PID=$!
 
+# 0b. Start the shared embedding server (master and agents connect to it)
+echo "[0/4] Launching Embedding Server..."
+./venv/bin/python3 -m core.embed_server > logs/embed_server.log 2>&1 &
+EMBED_PID=$!
+
 # 1. Start the Node.js AI Daemon
 echo "[1/4] Launching AI Daemon..."
 node gateway/src/daemon.js > logs/daemon.log 2>&1 &
@@ -37,6 +42,8 @@ cleanup() {
     kill $BRIDGE_PID
     echo "Killing CronMaster (PID: $CRON_PID)..."
     kill $CRON_PID
+    echo "Killing Embedding Server (PID: $EMBED_PID)..."
+    kill $EMBED_PID
     exit
 }
 
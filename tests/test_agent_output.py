@@ -0,0 +1,81 @@
+import os
+import sys
+from core.agent_output import (
+    AgentOutput, LineSplitter, iter_agent_streams, open_event_channel,
+    parse_event_line, parse_legacy_marker,
+)
+from core.agent_runner import AgentRunner
+
+AGENT_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+from core.protocol import AgentResponse
+print("working")
+AgentResponse.emit("image_generated", path="/tmp/cat.png")
+print("TELEGRAM_SUMMARY: legacy still works")
+AgentResponse.success("done")
+"""
+
+def test_legacy_markers_map_to_events():
+    assert parse_legacy_marker("IMAGE_GENERATED: /tmp/a.png\n") == {"event": "image_generated", "path": "/tmp/a.png"}
+    assert parse_legacy_marker("TELEGRAM_SUMMARY: hi") == {"event": "telegram_summary", "text": "hi"}
+    assert parse_legacy_marker("SUCCESS: Post published to x.")["event"] == "publish_succeeded"
+    assert parse_legacy_marker("plain text") is None
+    assert parse_event_line("not json") is None
+
+def test_agent_output_is_bounded():
+    output = AgentOutput(max_chars=1000)
+    for i in range(10000):
+        output.append(f"line {i}\n")
+
+    text = output.text()
+    assert len(text) < 1100
+    assert text.startswith("line 0\n")
+    assert text.rstrip().endswith("line 9999")
+    assert "omitted" in text
+
+def test_line_splitter_handles_split_and_endless_lines():
+    splitter = LineSplitter(max_chars=100)
+    assert splitter.feed(b"one\r") == []
+    assert splitter.feed(b"\ntwo\nthr") == ["one\n", "two\n"]
+    assert splitter.feed("ee \u00e9".encode("utf-8")[:-1]) == []  # half a character
+    assert splitter.feed(b"\xa9\n") == ["three \u00e9\n"]
+
+    pieces = [line for _ in range(1000) for line in splitter.feed(b"x" * 65536)]
+    pieces.append(splitter.close())
+    assert sum(map(len, pieces)) == 1000 * 65536
+    assert max(map(len, pieces)) <= 100 + 65536
+
+def test_events_arrive_on_dedicated_channel(tmp_path):
+    """
+    AgentResponse events reach the master as JSON lines on the event fd,
+    while legacy markers stay on stdout. Checked on both launch paths.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = tmp_path / "agent.py"
+    script.write_text(AGENT_SCRIPT.format(root=root))
+
+    for warm in (False, True):
+        runner = AgentRunner(enabled=warm, preload="")
+        event_r, event_w = open_event_channel()
+        try:
+            process = runner.spawn([sys.executable, str(script)], event_fd=event_w)
+        finally:
+            os.close(event_w)
+
+        stdout, events = [], []
+        for kind, line in iter_agent_streams(process, event_fd=event_r):
+            if kind == "stdout":
+                stdout.append(line)
+            elif kind == "event":
+                events.append(parse_event_line(line))
+        os.close(event_r)
+        runner.shutdown()
+
+        assert process.returncode == 0
+        assert events == [
+            {"event": "image_generated", "path": "/tmp/cat.png"},
+            {"event": "success", "message": "done"},
+        ]
+        assert "IMAGE_GENERATED: /tmp/cat.png\n" in stdout
+        assert "TELEGRAM_SUMMARY: legacy still works\n" in stdout
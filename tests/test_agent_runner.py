@@ -0,0 +1,120 @@
+import sys
+import time
+import pytest
+from core.agent_runner import AgentRunner, WarmInvocation, kill_agent
+
+AGENT_SCRIPT = """
+import sys
+print("ARGS:", " ".join(sys.argv[1:]))
+print("boom", file=sys.stderr)
+sys.exit(int(sys.argv[1]))
+"""
+
+def run(runner, script, code):
+    process = runner.spawn([sys.executable, str(script), str(code)])
+    lines = []
+    while True:
+        line = process.stdout.readline()
+        if not line and process.poll() is not None:
+            break
+        if line:
+            lines.append(line)
+    return process, lines, process.stderr.read()
+
+def test_warm_runner_streams_like_popen_and_recycles(tmp_path):
+    """
+    Warm invocations keep stdout, stderr and exit codes separate per call,
+    and the host is replaced once it reaches max_calls.
+    """
+    script = tmp_path / "agent.py"
+    script.write_text(AGENT_SCRIPT)
+    runner = AgentRunner(enabled=True, max_calls=2, preload="")
+
+    try:
+        process, lines, stderr = run(runner, script, 0)
+        assert isinstance(process, WarmInvocation)
+        assert lines == ["ARGS: 0\n"]
+        assert stderr == "boom\n"
+        assert process.returncode == 0
+        first_host = runner._hosts[sys.executable]
+
+        process, lines, _ = run(runner, script, 3)
+        assert process.returncode == 3
+        assert runner._hosts[sys.executable] is first_host
+
+        # Third call exceeds max_calls and lands on a fresh host
+        process, lines, _ = run(runner, script, 0)
+        assert lines == ["ARGS: 0\n"]
+        assert runner._hosts[sys.executable] is not first_host
+    finally:
+        runner.shutdown()
+
+def test_cold_runner_uses_popen(tmp_path):
+    script = tmp_path / "agent.py"
+    script.write_text(AGENT_SCRIPT)
+    runner = AgentRunner(enabled=False)
+
+    process, lines, stderr = run(runner, script, 2)
+    assert not isinstance(process, WarmInvocation)
+    assert lines == ["ARGS: 2\n"]
+    assert process.returncode == 2
+
+HANGING_SCRIPT = """
+import subprocess, time
+child = subprocess.Popen(["sleep", "600"])
+print(child.pid, flush=True)
+while True:
+    time.sleep(1)
+"""
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return False
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_kill_agent_takes_down_the_process_group(tmp_path, warm):
+    script = tmp_path / "hang.py"
+    script.write_text(HANGING_SCRIPT)
+    runner = AgentRunner(enabled=warm, preload="")
+    try:
+        process = runner.spawn([sys.executable, str(script)])
+        grandchild = int(process.stdout.readline())
+
+        kill_agent(process, grace=0.5)
+        time.sleep(0.2)
+        assert process.returncode is not None
+        assert not alive(grandchild)
+    finally:
+        runner.shutdown()
+
+def test_warm_agents_read_the_given_stdin_and_free_the_host(tmp_path):
+    import os
+    script = tmp_path / "ask.py"
+    script.write_text("try:\n    print('GOT', input())\nexcept EOFError:\n    print('EOF')\n")
+    runner = AgentRunner(enabled=True, preload="")
+    read_end, write_end = os.pipe()
+    os.write(write_end, b"yes\n")
+    os.close(write_end)
+    try:
+        process = runner.spawn([sys.executable, str(script)], stdin=read_end)
+        assert isinstance(process, WarmInvocation)
+        assert process.stdout.read() == "GOT yes\n"
+        process.wait()
+        # Without a stdin the agent reads /dev/null, never the master's own
+        process, lines, _ = run(runner, script, 0)
+        assert isinstance(process, WarmInvocation) and lines == ["EOF\n"]
+
+        # An abandoned run is killed, which frees the host for the next call
+        hang = tmp_path / "hang.py"
+        hang.write_text(HANGING_SCRIPT)
+        process = runner.spawn([sys.executable, str(hang)])
+        process.stdout.readline()
+        kill_agent(process, grace=0.5)
+        assert not runner._hosts[sys.executable].busy
+        assert isinstance(runner.spawn([sys.executable, str(script)]), WarmInvocation)
+    finally:
+        os.close(read_end)
+        runner.shutdown()
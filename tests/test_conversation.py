@@ -0,0 +1,34 @@
+from core.conversation import ConversationState, count_tokens
+
+def test_prompt_stays_within_budget_across_chained_steps():
+    """
+    Five chained agent steps with large outputs must not grow the prompt
+    past the budget; older steps survive as summary lines.
+    """
+    base = "SOUL and RAG context.\n\nUser Input: build me a report"
+    conversation = ConversationState(base, budget=600)
+
+    for step in range(5):
+        response = f"Step {step}.\nEXECUTE_AGENT: reader_agent --url https://example.com/{step}"
+        output = f"Page {step} title\n" + ("lorem ipsum dolor sit amet " * 200)
+        conversation.add_turn(response, output)
+        prompt = conversation.render()
+        assert count_tokens(prompt) <= 600
+        assert prompt.startswith(base)
+
+    assert "[EARLIER STEPS (summarized)]" in prompt
+    assert "reader_agent --url https://example.com/4" in prompt
+    assert "- Step 4: EXECUTE_AGENT: reader_agent --url https://example.com/3 -> Page 3 title" in prompt
+
+def test_repeated_agent_output_is_deduplicated():
+    conversation = ConversationState("base", budget=10000)
+    conversation.add_turn("EXECUTE_AGENT: sys_check", "CPU 5%")
+    conversation.add_turn("EXECUTE_AGENT: sys_check", "CPU 5%")
+
+    prompt = conversation.render()
+    assert prompt.count("CPU 5%") == 1
+    assert "(identical to the agent output of step 1)" in prompt
+
+def test_token_counter_handles_cjk():
+    assert count_tokens("帮我画个机器猫") == 7
+    assert count_tokens("check system status") == 3
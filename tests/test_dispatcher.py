@@ -0,0 +1,85 @@
+import time
+import threading
+import pytest
+from core.dispatcher import RequestDispatcher, QueueFull
+
+def test_dispatcher_orders_per_key_and_parallelizes_across_keys():
+    """
+    Requests from one chat run in order; different chats overlap.
+    """
+    log = []
+    lock = threading.Lock()
+    active = set()
+    overlap = []
+
+    def handler(key, idx):
+        with lock:
+            if active:
+                overlap.append((key, set(active)))
+            active.add(key)
+        time.sleep(0.05)
+        with lock:
+            active.discard(key)
+            log.append((key, idx))
+
+    dispatcher = RequestDispatcher(handler, workers=4).start()
+    for i in range(3):
+        dispatcher.submit("a", "a", i)
+        dispatcher.submit("b", "b", i)
+    dispatcher.shutdown(wait=True)
+
+    assert [i for k, i in log if k == "a"] == [0, 1, 2]
+    assert [i for k, i in log if k == "b"] == [0, 1, 2]
+    # Same-key requests never overlap, different keys do
+    assert all(key not in others for key, others in overlap)
+    assert overlap, "Requests for different chats should run concurrently"
+
+def test_dispatcher_survives_failing_handler():
+    done = []
+
+    def handler(idx):
+        if idx == 0:
+            raise ValueError("Boom!")
+        done.append(idx)
+
+    dispatcher = RequestDispatcher(handler, workers=1).start()
+    dispatcher.submit("cli", 0)
+    dispatcher.submit("cli", 1)
+    dispatcher.shutdown(wait=True)
+
+    assert done == [1]
+
+def test_dispatcher_round_robins_keys_and_caps_each_key():
+    order = []
+    gate = threading.Event()
+
+    def handler(key, idx):
+        gate.wait()
+        order.append((key, idx))
+
+    dispatcher = RequestDispatcher(handler, workers=1, max_per_key=3)
+    # "a" floods the queue before "b" and "c" send anything
+    assert [dispatcher.submit("a", "a", i) for i in range(3)] == [0, 1, 2]
+    with pytest.raises(QueueFull):
+        dispatcher.submit("a", "a", 3)
+    dispatcher.submit("b", "b", 0)
+    dispatcher.submit("c", "c", 0)
+
+    dispatcher.start()
+    gate.set()
+    dispatcher.shutdown(wait=True)
+
+    assert order == [("a", 0), ("b", 0), ("c", 0), ("a", 1), ("a", 2)]
+
+def test_dispatcher_drop_pending_keeps_other_keys():
+    done = []
+    dispatcher = RequestDispatcher(lambda key, idx: done.append((key, idx)), workers=1)
+    for i in range(3):
+        dispatcher.submit("a", "a", i)
+    dispatcher.submit("b", "b", 0)
+
+    assert dispatcher.drop_pending("a") == 3
+    assert dispatcher.drop_pending("a") == 0
+    dispatcher.start()
+    dispatcher.shutdown(wait=True)
+    assert done == [("b", 0)]
@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+import numpy as np
+from core.embeddings import EmbeddingProvider
+
+class SlowModel:
+    """Deterministic stand-in: each text maps to [len(text), 1, 0]."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(0.05)
+        return np.array([[len(t), 1, 0] for t in texts], dtype=np.float32)
+
+def test_concurrent_calls_share_forward_passes():
+    model = SlowModel()
+    provider = EmbeddingProvider(model=model, max_batch=64, max_wait=0.01)
+    results = {}
+
+    def worker(i):
+        results[i] = provider.encode("x" * i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 17)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results[i].tolist() == [i, 1, 0] for i in range(1, 17))
+    assert sum(len(c) for c in model.calls) == 16
+    assert len(model.calls) < 16
+
+def test_list_input_returns_matrix_in_order():
+    provider = EmbeddingProvider(model=SlowModel(), max_wait=0)
+    vectors = provider.encode(["a", "bbb"])
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [1, 3]
+
+def test_query_scope_encodes_the_user_input_once(monkeypatch):
+    import core.embeddings as embeddings
+    model = SlowModel()
+    monkeypatch.setattr(embeddings, "_embedder", EmbeddingProvider(model=model, max_wait=0))
+
+    with embeddings.query_scope("hello"):
+        first = embeddings.embed_query("hello")   # router
+        second = embeddings.embed_query("hello")  # RAG search, cache
+        other = embeddings.embed_query("bye")     # unrelated text is not cached
+    embeddings.embed_query("hello")               # outside the scope
+
+    assert first is second
+    assert other.tolist() == [3, 1, 0]
+    assert model.calls == [["hello"], ["bye"], ["hello"]]
+
+def test_remote_embedder_uses_server_and_falls_back(tmp_path):
+    from core.embeddings import RemoteEmbedder
+    from core.embed_server import EmbedServer
+
+    path = str(tmp_path / "embed.sock")
+    server_model = SlowModel()
+    server = EmbedServer(path, EmbeddingProvider(model=server_model, max_wait=0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = RemoteEmbedder(path, timeout=5)
+    local_model = SlowModel()
+    client._local = EmbeddingProvider(model=local_model, max_wait=0, backend="torch")
+    try:
+        assert client.encode(["ab", "abcd"])[:, 0].tolist() == [2, 4]
+        assert client.encode("abc").tolist() == [3, 1, 0]
+        assert len(server_model.calls) == 2 and not local_model.calls
+        assert client.model_key().endswith("@torch")
+    finally:
+        server.shutdown()
+        server.server_close()
+    os.unlink(path)
+
+    # No server on the socket: the in-process model takes over
+    client = RemoteEmbedder(path, timeout=5)
+    client._local = EmbeddingProvider(model=local_model, max_wait=0)
+    assert client.encode("abcde").tolist() == [5, 1, 0]
+    assert local_model.calls == [["abcde"]]
+
+def test_model_key_names_the_backend_that_loaded(tmp_path, monkeypatch):
+    import sentence_transformers
+    from core.embedding_cache import EmbeddingCache, model_key
+
+    class FakeSentenceTransformer(SlowModel):
+        def __init__(self, name):
+            super().__init__()
+
+    # onnxruntime missing or the export not built: onnx falls back to torch
+    monkeypatch.setattr("core.onnx_embedder.ONNX_MODEL_DIR", "/nonexistent")
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", FakeSentenceTransformer)
+    provider = EmbeddingProvider("mini", backend="onnx", max_wait=0)
+    assert model_key(provider) == "mini@torch"
+    cache = EmbeddingCache("docs", str(tmp_path), encoder=provider)
+    cache.get_many(["x"], provider.encode)
+    assert cache.model == "mini@torch"
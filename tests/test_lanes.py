@@ -0,0 +1,17 @@
+from collections import Counter
+from core.lanes import LaneScheduler, LEGACY_INBOX, lane_key, lane_of
+
+def test_strict_order_prefers_high_and_keeps_legacy_in_normal():
+    keys = LaneScheduler(mode="strict").keys()
+    assert keys == [lane_key("high"), lane_key("normal"), LEGACY_INBOX, lane_key("bulk")]
+    assert lane_of(LEGACY_INBOX) == "normal"
+    assert lane_of(lane_key("bulk")) == "bulk"
+
+def test_weighted_splits_pops_by_weight():
+    scheduler = LaneScheduler(mode="weighted", weights="high:6,normal:3,bulk:1")
+    served = Counter()
+    for _ in range(100):
+        lane = lane_of(scheduler.keys()[0])
+        served[lane] += 1
+        scheduler.served(lane)
+    assert served == {"high": 60, "normal": 30, "bulk": 10}
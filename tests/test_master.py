@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import asyncio
+import contextvars
+import threading
+import pytest
+import fakeredis
+import master
+from core.agent_limits import AgentLimits
+from core.agent_runner import AgentRunner
+from core.dispatcher import RequestDispatcher
+from core.lanes import lane_key
+from core.stream_parser import AgentDirective
+
+def test_inbox_survives_payloads_that_are_not_requests(monkeypatch):
+    server = fakeredis.FakeServer()
+    connect = lambda *args, **kwargs: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(master.aioredis, "from_url", connect)
+    received = []
+    done = threading.Event()
+
+    def handler(user_input, source, metadata):
+        received.append((user_input, source))
+        done.set()
+
+    dispatcher = RequestDispatcher(handler, workers=1).start()
+
+    async def scenario():
+        r = connect()
+        consumer = asyncio.create_task(master.consume_inbox(dispatcher))
+        for payload in ("[1, 2]", "42", "not json", json.dumps({"text": ["x"]}), json.dumps({"chat_id": 7, "text": "hello"})):
+            await r.rpush(lane_key("high"), payload)
+        await asyncio.get_running_loop().run_in_executor(None, done.wait, 5)
+        while not consumer.done():
+            consumer.cancel()  # fakeredis' blocking pop can swallow one cancellation
+            await asyncio.sleep(0.05)
+        await r.aclose()
+
+    asyncio.run(scenario())
+    dispatcher.shutdown(wait=True)
+    assert received == [("hello", "telegram")]
+
+def test_cron_jobs_do_not_hold_up_the_chat_they_report_to():
+    release = threading.Event()
+    ran = []
+
+    def handler(user_input, source, metadata):
+        if source == "cron":
+            release.wait(5)
+        ran.append(user_input)
+
+    dispatcher = RequestDispatcher(handler, workers=3, max_per_key=1).start()
+    admin = {"chat_id": 7, "username": "admin"}
+    cron = {**admin, "platform": "cron", "task": "digest"}
+    try:
+        assert master.request_key("cron", cron) == "cron:digest"
+        # Over the per-chat cap, yet neither refused nor announced
+        assert master.admit_request(dispatcher, "digest 1", "cron", cron) is None
+        assert master.admit_request(dispatcher, "digest 2", "cron", cron) is None
+        assert master.admit_request(dispatcher, "hello", "telegram", admin) is None
+        deadline = time.time() + 5
+        while "hello" not in ran and time.time() < deadline:
+            time.sleep(0.01)
+        assert ran == ["hello"]
+    finally:
+        release.set()
+        dispatcher.shutdown(wait=True)
+    assert ran == ["hello", "digest 1", "digest 2"]
+
+STUB_AGENT = """
+import os, sys, time, subprocess
+opts = dict(arg.split("=", 1) for arg in sys.argv[1:])
+tag, log = opts["tag"], opts.get("log")
+
+def record(what):
+    if log:
+        with open(log, "a") as f:
+            f.write(f"{what} {tag} {time.time()}\\n")
+
+record("start")
+if "child" in opts:
+    child = subprocess.Popen(["sleep", "30"])
+    print(f"child {child.pid}", flush=True)
+deadline = time.time() + float(opts.get("delay", 0))
+while time.time() < deadline:
+    if "stderr" in opts:
+        sys.stderr.write("working\\n")
+        sys.stderr.flush()
+    elif "quiet" not in opts:
+        print("working", flush=True)
+    time.sleep(float(opts.get("every", 0.05)))
+record("end")
+print(f"done {tag}")
+"""
+
+LIMITS = """
+agents:
+  clock: {timeout: 1, idle_timeout: 0}
+  idle: {timeout: 10, idle_timeout: 0.5}
+"""
+
+@pytest.fixture
+def stub_agents(tmp_path, monkeypatch):
+    """An agents dir with the stub agent under several names (see LIMITS), run as plain subprocesses."""
+    for name in ("stub", "clock", "idle"):
+        script = tmp_path / "agents" / name / "src" / "main.py"
+        script.parent.mkdir(parents=True)
+        script.write_text(STUB_AGENT)
+    (tmp_path / "limits.yaml").write_text(LIMITS)
+    runner = AgentRunner(enabled=False)
+    monkeypatch.setattr(master, "AGENTS_DIR", str(tmp_path / "agents"))
+    monkeypatch.setattr(master, "AGENT_LIMITS", AgentLimits(str(tmp_path / "limits.yaml")))
+    monkeypatch.setattr(master, "get_agent_runner", lambda: runner)
+    yield tmp_path
+    runner.shutdown()
+
+def test_agent_batch_caps_concurrency_and_merges_in_directive_order(stub_agents, monkeypatch):
+    monkeypatch.setattr(master, "AGENT_CONCURRENCY", 2)
+    log = stub_agents / "runs.log"
+    delays = {"a": 0.6, "b": 0.1, "c": 0.3, "d": 0.1}
+    batch = master.AgentBatch(None, None, 1)
+    for tag, delay in delays.items():
+        batch.start(AgentDirective("stub", f"tag={tag} delay={delay} quiet=1 log={log}"))
+    batch.start(AgentDirective("stub", f"tag=b delay=0.1 quiet=1 log={log}"))  # duplicate
+
+    merged = batch.merged_output()
+    assert [line for line in merged.splitlines() if line.startswith("done")] == ["done a", "done b", "done c", "done d"]
+
+    events = sorted((float(t), what, tag) for what, tag, t in (line.split() for line in log.read_text().splitlines()))
+    assert sorted(tag for _, what, tag in events if what == "start") == ["a", "b", "c", "d"]
+    running = peak = 0
+    for _, what, _ in events:
+        running += 1 if what == "start" else -1
+        peak = max(peak, running)
+    assert peak == 2
+    # b finished well before a, yet a's output comes first
+    ends = {tag: t for t, what, tag in events if what == "end"}
+    assert ends["b"] < ends["a"]
+
+def gone(pid, wait=5):
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_wall_clock_limit_kills_the_process_group(stub_agents):
+    started = time.time()
+    result = master.execute_agent("clock", "tag=x delay=30 every=0.1 child=1")
+    assert time.time() - started < 5
+    assert "[TIMEOUT]" in result and "time limit" in result
+    assert gone(int(result.split("child ")[1].split()[0]))
+
+def test_idle_limit_counts_stdout_and_stderr(stub_agents):
+    result = master.execute_agent("idle", "tag=x delay=30 quiet=1")
+    assert "[TIMEOUT]" in result and "no output" in result
+
+    # Silent on stdout for 2s, but logging progress to stderr
+    result = master.execute_agent("idle", "tag=x delay=2 stderr=1 every=0.1")
+    assert "[TIMEOUT]" not in result and "done x" in result
+
+    # stderr output does not get around the wall clock either
+    result = master.execute_agent("clock", "tag=x delay=30 stderr=1 every=0.1")
+    assert "time limit" in result
+
+def test_cancel_stops_the_running_agent(stub_agents):
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    token = master.CANCEL_EVENT.set(cancel)
+    try:
+        started = time.time()
+        result = master.execute_agent("stub", "tag=x delay=30 every=0.1")
+    finally:
+        master.CANCEL_EVENT.reset(token)
+    assert time.time() - started < 5
+    assert "[CANCELLED]" in result and "do not start new agents" in result
+
+ASK_AGENT = """
+import sys
+open(sys.argv[1], "w").close()  # waiting for input now
+try:
+    print("GOT", input())
+except EOFError:
+    print("EOF")
+"""
+
+def test_only_an_agent_of_a_cli_request_reads_the_terminal(stub_agents, monkeypatch):
+    script = stub_agents / "agents" / "ask" / "src" / "main.py"
+    script.parent.mkdir(parents=True)
+    script.write_text(ASK_AGENT)
+    read_end, write_end = os.pipe()
+    monkeypatch.setattr(master.sys, "stdin", os.fdopen(read_end, "r"))
+    monkeypatch.setattr(master, "TERMINAL", master.Terminal())
+    typed = []
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    loop.call_soon_threadsafe(master.watch_stdin, loop, typed.append)
+
+    def ask(source):
+        waiting = stub_agents / f"waiting-{source}"
+        token = master.REQUEST_SOURCE.set(source)
+        try:
+            worker = master.AGENT_POOL.submit(contextvars.copy_context().run, master.execute_agent, "ask", str(waiting))
+        finally:
+            master.REQUEST_SOURCE.reset(token)
+        deadline = time.time() + 5
+        while not waiting.exists() and time.time() < deadline:
+            time.sleep(0.01)
+        os.write(write_end, f"answer for {source}\n".encode())
+        return worker.result(timeout=5)
+
+    try:
+        # The agent of a CLI request gets the line, the master's reader does not
+        assert ask("cli") == "GOT answer for cli"
+        # Other agents read /dev/null; the line is a new CLI request
+        assert ask("telegram") == "EOF"
+        deadline = time.time() + 5
+        while not typed and time.time() < deadline:
+            time.sleep(0.01)
+        assert typed == ["answer for telegram"]
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        os.close(write_end)
@@ -0,0 +1,113 @@
+import fnmatch
+import numpy as np
+from core.embeddings import EmbeddingProvider
+from core.memory_index import MemoryIndex, MEMORY_VERSION_KEY
+
+class DictRedis:
+    """The handful of Redis commands MemoryIndex uses, over a dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key.encode(), {}).update(
+            {k.encode(): v.encode() if isinstance(v, str) else v for k, v in mapping.items()}
+        )
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key.encode())
+
+    def incr(self, key):
+        self.round_trips += 1
+        value = int(self.data.get(key.encode(), 0)) + 1
+        self.data[key.encode()] = str(value).encode()
+        return value
+
+    def scan_iter(self, match, count):
+        self.round_trips += 1
+        return [k for k in list(self.data) if fnmatch.fnmatch(k.decode(), match)]
+
+    def pipeline(self, transaction=True):
+        client, calls = self, []
+
+        class Pipeline:
+            def hmget(self, key, *fields):
+                calls.append((key, fields))
+
+            def execute(self):
+                client.round_trips += 1
+                return [[client.data[key].get(f.encode()) for f in fields] for key, fields in calls]
+
+        return Pipeline()
+
+def write(r, key, text, vector):
+    r.hset(key, {"text": text, "vector": np.asarray(vector, dtype=np.float32).tobytes()})
+
+def test_top_k_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    r = DictRedis()
+    for i, v in enumerate(vectors):
+        write(r, f"genie:mem:{i}", f"doc{i}", v)
+
+    index = MemoryIndex(r)
+    index.refresh()
+    assert index.size == 300 and r.round_trips == 3  # get + scan + one pipeline
+
+    query = rng.normal(size=16).astype(np.float32)
+    sims = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    expected = [f"doc{i}" for i in np.argsort(-sims)[:5]]
+    assert [text for text, _ in index.search(query, top_k=5)] == expected
+
+def test_local_writes_are_incremental_and_foreign_writes_reload():
+    r = DictRedis()
+    write(r, "genie:mem:a", "apple", [1, 0, 0])
+    index = MemoryIndex(r)
+    index.refresh()
+
+    write(r, "genie:mem:b", "banana", [0, 1, 0])
+    index.add("genie:mem:b", "banana", [0, 1, 0])
+    index.written()
+    index.refresh()
+    assert index.size == 2 and index.search([0, 1, 0], 1)[0][0] == "banana"
+
+    # Another process writes and bumps the version
+    write(r, "genie:mem:c", "cherry", [0, 0, 1])
+    r.incr(MEMORY_VERSION_KEY)
+    index.refresh()
+    assert index.search([0, 0, 1], 1)[0][0] == "cherry"
+
+def clustered(rows, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(20, size=rows)] + 0.3 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+def test_ivf_recall_against_brute_force_and_saved_centroids(tmp_path):
+    from core.ann_index import IVFIndex, recall_at_k
+    vectors = clustered(2000)
+    r = DictRedis()
+    for i, v in enumerate(vectors):
+        write(r, f"genie:mem:{i}", f"doc{i}", v)
+    ann_path = str(tmp_path / "mem.npy")
+
+    encoder = EmbeddingProvider(model=object(), backend="torch")
+    index = MemoryIndex(r, ann_path=ann_path, ann_min_rows=10**6, encoder=encoder)
+    index.refresh()
+    assert index.ann is None
+    assert index.build_ann()
+
+    queries = clustered(50, seed=1)
+    assert recall_at_k(index, queries, top_k=5, nprobe=index.ann.nlist) == 1.0
+    assert recall_at_k(index, queries, top_k=5, nprobe=4) >= 0.9
+
+    # Another process reuses the saved centroids instead of retraining
+    other = MemoryIndex(r, ann_path=ann_path, ann_min_rows=1000, encoder=encoder)
+    other.refresh()
+    assert other.ann is not None and not other._training
+    np.testing.assert_array_equal(other.ann.centroids, index.ann.centroids)
+
+    # ...but not one encoding with another backend
+    onnx = EmbeddingProvider(model=object(), backend="onnx")
+    assert IVFIndex.load(ann_path, index.dim, MemoryIndex(r, encoder=onnx).model) is None
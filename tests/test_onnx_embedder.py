@@ -0,0 +1,18 @@
+import numpy as np
+from core.onnx_embedder import cosine_agreement, mean_pool_normalize
+
+def test_mean_pool_ignores_padding_and_normalizes():
+    hidden = np.array([
+        [[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]],  # last token is padding
+        [[0.0, 2.0], [0.0, 2.0], [0.0, 2.0]],
+    ], dtype=np.float32)
+    mask = np.array([[1, 1, 0], [1, 1, 1]])
+
+    pooled = mean_pool_normalize(hidden, mask)
+    assert pooled.dtype == np.float32
+    assert np.allclose(pooled, [[1.0, 0.0], [0.0, 1.0]])
+
+def test_cosine_agreement_is_row_wise():
+    a = np.array([[1.0, 0.0], [0.0, 1.0]])
+    b = np.array([[2.0, 0.0], [1.0, 1.0]])
+    assert np.allclose(cosine_agreement(a, b), [1.0, np.sqrt(0.5)])
@@ -0,0 +1,36 @@
+import numpy as np
+from core.response_cache import SemanticResponseCache
+
+VECTORS = {
+    "what can you do": [1.0, 0.0, 0.0],
+    "what can you do?": [0.99, 0.05, 0.0],
+    "draw a cat": [0.0, 1.0, 0.0],
+}
+
+def encode(text):
+    return np.array(VECTORS[text], dtype=np.float32)
+
+def test_similar_question_hits_within_same_context():
+    cache = SemanticResponseCache(encode, threshold=0.95, ttl=60, max_entries=10)
+    cache.store("what can you do", "ctx", "I can draw, post and read.", latency=4.0)
+
+    hit = cache.lookup("what can you do?", "ctx")
+    assert hit["response"] == "I can draw, post and read."
+    assert cache.lookup("draw a cat", "ctx") is None
+    # Same question, different context (e.g. other RAG results) is a miss
+    assert cache.lookup("what can you do", "other ctx") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["saved_seconds"] == 4.0
+
+def test_ttl_and_lru_eviction():
+    cache = SemanticResponseCache(encode, threshold=0.95, ttl=60, max_entries=1)
+    cache.store("what can you do", "ctx", "old", latency=1.0)
+    cache.store("draw a cat", "ctx", "new", latency=1.0)
+    assert cache.lookup("what can you do", "ctx") is None
+    assert cache.lookup("draw a cat", "ctx")["response"] == "new"
+
+    cache.ttl = -1
+    assert cache.lookup("draw a cat", "ctx") is None
+    assert cache.stats()["entries"] == 0
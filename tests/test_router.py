@@ -0,0 +1,136 @@
+import os
+import time
+import numpy as np
+import core.router as router_module
+from core.embeddings import EmbeddingProvider
+
+VOCAB = ["draw", "image", "tweet", "post", "status", "system"]
+
+class BagOfWords:
+    """Toy embedding: one dimension per known word."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[float(w in t.split()) for w in VOCAB] + [0.01] for t in texts], dtype=np.float32)
+
+def make_router(tmp_path, monkeypatch, routes, lazy=False):
+    path = tmp_path / "routes.yaml"
+    path.write_text(routes)
+    model = BagOfWords()
+    monkeypatch.setattr(router_module, "ROUTES_PATH", str(path))
+    monkeypatch.setenv("GENIE_EMBED_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(router_module, "get_embedder", lambda: EmbeddingProvider(model=model, max_wait=0))
+    monkeypatch.setattr(router_module, "embed_query", lambda text: model.encode([text])[0])
+    monkeypatch.setattr(router_module.GenieRouter, "_instance", None)
+    return router_module.GenieRouter(lazy=lazy), model, path
+
+ROUTES = """
+threshold: 0.5
+routes:
+  imggen: {priority: 2, keywords: ["生图", "画"], phrases: ["draw image", "image"]}
+  socialpub: {priority: 1, keywords: {"发布": 1, "推": 0.5, "转发": 0.5}, phrases: ["tweet", "post tweet"]}
+"""
+
+def test_matrix_scoring_and_batch_agree(tmp_path, monkeypatch):
+    router, _, _ = make_router(tmp_path, monkeypatch, ROUTES)
+    texts = ["please draw", "post it", "weather today", "生图 now"]
+    assert [router.guide(t) for t in texts] == ["imggen", "socialpub", None, "imggen"]
+    assert router.guide_batch(texts) == ["imggen", "socialpub", None, "imggen"]
+
+def test_reload_only_encodes_new_phrases(tmp_path, monkeypatch):
+    router, model, path = make_router(tmp_path, monkeypatch, ROUTES)
+    assert sorted(model.encoded) == ["draw image", "image", "post tweet", "tweet"]
+
+    model.encoded.clear()
+    path.write_text(ROUTES + '  sys_check: {phrases: ["system status", "tweet"]}\n')
+    os.utime(path, (1, 1))  # make sure the mtime differs
+    router.reload()
+
+    assert model.encoded == ["system status"]
+    assert router.guide("status please") == "sys_check"
+
+def test_restart_reads_phrase_vectors_from_disk(tmp_path, monkeypatch):
+    make_router(tmp_path, monkeypatch, ROUTES)
+    router, model, _ = make_router(tmp_path, monkeypatch, ROUTES)  # a fresh process, same files
+    assert model.encoded == []
+    assert router.guide("tweet this") == "socialpub"
+
+def test_embedding_cache_ignores_files_of_another_model(tmp_path):
+    from core.embedding_cache import EmbeddingCache
+    model = BagOfWords()
+    EmbeddingCache("docs", str(tmp_path), model="a").get_many(["image"], model.encode)
+    EmbeddingCache("docs", str(tmp_path), model="b").get_many(["image"], model.encode)
+    assert model.encoded == ["image", "image"]
+
+def test_keyword_layer_weights_priority_and_stats(tmp_path, monkeypatch):
+    router, model, _ = make_router(tmp_path, monkeypatch, ROUTES)
+    model.encoded.clear()
+
+    assert router.guide("发布这张画") == "imggen"    # both fire, higher priority wins
+    assert router.guide("推一下") is None            # 0.5 < min_score
+    assert router.guide("推荐并转发") == "socialpub"  # 0.5 + 0.5
+    assert model.encoded == ["推一下"]
+
+    stats = router.stats()
+    assert stats["keyword_hits"] == 2 and stats["none_hits"] == 1
+    assert stats["keyword_rate"] == round(2 / 3, 4)
+
+def test_lazy_router_is_keyword_only_until_warm(tmp_path, monkeypatch):
+    router, model, _ = make_router(tmp_path, monkeypatch, ROUTES, lazy=True)
+    assert model.encoded == []
+
+    assert router.classify("画一张") == ("imggen", "keyword")
+    assert router.classify("tweet this") == (None, "cold")
+    assert model.encoded == []
+
+    router.warm()
+    assert router.classify("tweet this") == ("socialpub", "semantic")
+    assert router.stats()["cold_hits"] == 1
+
+def test_requests_do_not_wait_for_warm_up(tmp_path, monkeypatch):
+    import threading
+    router, model, _ = make_router(tmp_path, monkeypatch, ROUTES, lazy=True)
+    release = threading.Event()
+    encode = model.encode
+    model.encode = lambda texts: release.wait(5) and encode(texts)
+
+    warmer = threading.Thread(target=router.warm)
+    warmer.start()
+    try:
+        assert router.classify("画一张") == ("imggen", "keyword")
+        assert router.classify("tweet this") == (None, "cold")
+        assert warmer.is_alive()  # still encoding route phrases
+    finally:
+        release.set()
+        warmer.join()
+    assert router.classify("tweet this") == ("socialpub", "semantic")
+
+def test_failed_warm_up_is_retried(tmp_path, monkeypatch):
+    router, model, _ = make_router(tmp_path, monkeypatch, ROUTES, lazy=True)
+    encode = model.encode
+
+    def broken(texts):
+        raise RuntimeError("model not downloaded")
+
+    model.encode = broken
+
+    router.warm()
+    assert router.table is None and router._retry_at is not None
+    assert router.classify("tweet this") == (None, "cold")
+
+    model.encode = encode
+    router._retry_at = 0  # don't wait out the backoff
+    router.classify("tweet this")  # starts the retry in the background
+    deadline = time.time() + 5
+    while router.table is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert router.classify("tweet this") == ("socialpub", "semantic")
+
+def test_automaton_finds_overlapping_keywords():
+    from core.keyword_automaton import KeywordAutomaton
+    automaton = KeywordAutomaton(["he", "she", "hers", "His", "发个推"])
+    assert automaton.findall("USHERS") == {"he", "she", "hers"}
+    assert automaton.findall("帮我发个推吧 his") == {"发个推", "his"}
@@ -0,0 +1,58 @@
+import numpy as np
+from core.segment_store import SegmentStore
+
+VECTORS = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+
+def unit(i):
+    return VECTORS[i] / np.linalg.norm(VECTORS[i])
+
+def test_overwrite_delete_and_other_readers(tmp_path):
+    writer = SegmentStore(str(tmp_path), segment_rows=4)
+    reader = SegmentStore(str(tmp_path), segment_rows=4)  # e.g. another process
+    writer.put_many([(f"k{i}", f"doc{i}", unit(i)) for i in range(10)])
+    assert reader.search(unit(3), 1)[0][0] == "doc3"
+
+    writer.put("k3", "doc3 v2", unit(3))
+    writer.delete(["k5"])
+    assert reader.search(unit(3), 1)[0][0] == "doc3 v2"
+    assert "doc5" not in [t for t, _ in reader.search(unit(5), 10)]
+    assert len(reader) == 9
+
+def test_merge_drops_dead_rows_and_keeps_results(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_rows=4, max_sealed=100)
+    store.put_many([(f"k{i}", f"doc{i}", unit(i)) for i in range(20)])
+    store.put_many([(f"k{i}", f"new{i}", unit(i)) for i in range(0, 20, 2)])
+    store.delete([f"k{i}" for i in range(1, 20, 4)])
+    queries = [unit(i) for i in range(20)]
+    before = [[t for t, _ in store.search(q, 3)] for q in queries]
+    stats = store.stats()
+
+    assert store.merge()
+    after = SegmentStore(str(tmp_path))
+    assert [[t for t, _ in after.search(q, 3)] for q in queries] == before
+    merged = after.stats()
+    assert merged["live"] == stats["live"] == 15
+    assert merged["segments"] < stats["segments"] and merged["dead"] < stats["dead"]
+
+def test_float16_segments(tmp_path):
+    store = SegmentStore(str(tmp_path), dtype="float16")
+    store.put_many([(f"k{i}", f"doc{i}", unit(i)) for i in range(8)])
+    text, score = store.search(unit(6), 1)[0]
+    assert text == "doc6" and abs(score - 1.0) < 1e-2
+    assert (tmp_path / "seg-000000.vec").stat().st_size == 8 * 8 * 2
+
+def test_ivf_is_shared_with_readers_and_assigns_new_rows(tmp_path):
+    rng = np.random.default_rng(2)
+    centers = rng.normal(size=(10, 8))
+    vectors = (centers[rng.integers(10, size=600)] + 0.2 * rng.normal(size=(600, 8))).astype(np.float32)
+    writer = SegmentStore(str(tmp_path), segment_rows=256, ann_min_rows=10**6)
+    writer.put_many([(f"k{i}", f"doc{i}", v) for i, v in enumerate(vectors[:500])])
+    assert writer.build_ann()
+
+    reader = SegmentStore(str(tmp_path))
+    writer.put_many([(f"k{i}", f"doc{i}", v) for i, v in enumerate(vectors[500:], 500)])
+    reader.refresh()
+    full = reader.ann.nlist
+    for i in (3, 250, 599):
+        assert reader.search(vectors[i], 5, nprobe=full) == reader.search(vectors[i], 5, exact=True)
+        assert reader.search(vectors[i], 1, nprobe=1)[0][0] == f"doc{i}"
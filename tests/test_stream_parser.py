@@ -0,0 +1,18 @@
+from core.stream_parser import AgentDirective, DirectiveStreamParser
+
+def test_directive_is_reported_once_its_line_completes():
+    parser = DirectiveStreamParser()
+    assert parser.feed("Sure, let me draw that.\nEXECUTE_AG") == []
+    assert parser.feed("ENT: imggen --prompt \"a ca") == []
+    assert parser.feed("t\"\nI will report back") == [AgentDirective("imggen", "--prompt \"a cat\"")]
+    assert parser.close() == []
+
+def test_unterminated_last_line_is_flushed_on_close():
+    parser = DirectiveStreamParser()
+    assert parser.feed("Checking now.\nEXECUTE_AGENT: sys_check") == []
+    assert parser.close() == [AgentDirective("sys_check", "")]
+
+def test_agent_name_on_following_line():
+    parser = DirectiveStreamParser()
+    assert parser.feed("EXECUTE_AGENT:\n") == []
+    assert parser.feed("vault --search cats\n") == [AgentDirective("vault", "--search cats")]
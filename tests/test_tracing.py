@@ -0,0 +1,27 @@
+import core.tracing as tracing
+
+def test_spans_carry_request_context_and_summarize(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(mode="file", path=str(path)))
+
+    with tracing.request_scope(request_id="req1", chat_id=42):
+        for _ in range(3):
+            with tracing.span("router.guide") as trace:
+                trace["route"] = "imggen"
+        tracing.record_span("gemini.first_chunk", 0.25)
+
+    spans = tracing.load_spans("file", str(path))
+    assert len(spans) == 4
+    assert all(s["request_id"] == "req1" and s["chat_id"] == 42 for s in spans)
+    assert spans[0]["route"] == "imggen"
+
+    summary = tracing.summarize(spans)
+    assert summary["router.guide"]["count"] == 3
+    assert summary["gemini.first_chunk"]["p50"] == 250.0
+
+def test_disabled_tracer_writes_nothing(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(mode="off", path=str(path)))
+    with tracing.span("build_context"):
+        pass
+    assert not path.exists()
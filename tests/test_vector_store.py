@@ -0,0 +1,38 @@
+import numpy as np
+import core.segment_store as segment_store
+import core.vector_store as vector_store
+
+class CountingModel:
+    """Toy embedding (one dimension per letter) that counts encode calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        self.calls.append(len(batch))
+        vectors = np.array([[t.count(c) for c in "abcdefgh"] + [0.1] for t in batch], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+def test_ingest_many_encodes_in_batches(tmp_path, monkeypatch, capsys):
+    model = CountingModel()
+    monkeypatch.setattr(vector_store, "get_embedder", lambda: model)
+    monkeypatch.setattr(vector_store, "embed_query", model.encode)
+    monkeypatch.setattr(segment_store, "SEGMENT_DIR", str(tmp_path))
+    store = vector_store.VectorStore(backend="segments")
+
+    texts = ["aaa", "bbb", "ccc", "ddd", "eee", "fff", "ggg", "hhh", "abab", "cdcd"]
+    assert store.ingest_many(texts, [f"doc{i}" for i in range(10)], batch_size=4) == 10
+    assert model.calls == [4, 4, 2]
+    assert "docs/sec" in capsys.readouterr().out
+
+    store.ingest("hhhh", "doc7")  # same id: replaces
+    assert store.search("ggg", top_k=1) == ["ggg"]
+    assert store.search("hhh", top_k=1) == ["hhhh"]
+
+def test_location_names_the_backend_in_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "get_embedder", CountingModel)
+    monkeypatch.setattr(segment_store, "SEGMENT_DIR", str(tmp_path))
+    assert vector_store.VectorStore(backend="segments").location() == f"segment files in {tmp_path}"
+    assert vector_store.VectorStore(db=3, backend="redis").location() == "Redis DB 3 at localhost:6379"